@@ -67,7 +67,7 @@ class DatabaseController:
                     "updated_on_notion_status",
                     "created_at"
                 ],
-                order_by=[("CAST(id AS INTEGER)", "DESC")],
+                order_by=[("id", "DESC")],
                 limit=limit,
                 logger=self.logger
             )
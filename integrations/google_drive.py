@@ -1,14 +1,33 @@
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 
-import sys, time, os, random
+import sys, time, os, random, threading
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.log_config import get_logger
 
 logger = get_logger("GD", "app.log")
 
+# mycreds.txt is read, refreshed and saved by one thread at a time
+# (scraper and upload threads ask for a drive concurrently)
+_auth_lock = threading.Lock()
+# Authorized drive per thread, the httplib2 connection behind it isn't thread safe
+_local = threading.local()
+
+
 def get_drive():
+    """Authorized GoogleDrive of the calling thread (re-authorized once its token expires)"""
+    drive = getattr(_local, "drive", None)
+    if drive is not None and not drive.auth.access_token_expired:
+        return drive
+
+    with _auth_lock:
+        drive = _authorize()
+    _local.drive = drive
+    return drive
+
+
+def _authorize():
     # Auth
     gauth = GoogleAuth()
     gauth.LoadClientConfigFile("client_secrets.json")
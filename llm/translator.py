@@ -1,5 +1,6 @@
 import openai
 import json, ast
+import asyncio
 from collections import defaultdict
 
 
@@ -8,7 +9,8 @@ from utils.constants import (OPENAI_API_KEY,
                              DB_NAME,
                              TABLE_PRODUCT_DATA,
                              TABLE_PRODUCT_IMAGES,
-                             TRANSLATION_MODEL
+                             TRANSLATION_MODEL,
+                             TRANSLATION_CONCURRENCY
                              )
 from utils.db_utils import fetch_many, update_row
 from utils.log_config import get_logger
@@ -16,14 +18,25 @@ from utils.utils import json_loads, json_dumps
 
 logger = get_logger("tranlation", "app.log")
 
+# The OpenAI client retries 429 / 5xx / connection errors with exponential backoff
+OPENAI_MAX_RETRIES = 5
+
+# Entries translated in one request (shared system prompt, one JSON object back)
+TRANSLATION_BATCH_SIZE = 10
+
 
 def parse_json_with_duplicates(json_str):
 
     if type(json_str) == dict:
         return json_str
     
-    json_str = json_str.replace("'", "''")
     pairs = json.loads(json_str, object_pairs_hook=lambda pairs: pairs)
+
+    # Fast path: no duplicate keys, build the dict in C without the merge pass
+    result = dict(pairs)
+    if len(result) == len(pairs):
+        return result
+
     merged = defaultdict(list)
     
     for key, value in pairs:
@@ -38,20 +51,24 @@ def parse_json_with_duplicates(json_str):
     return result
 
 
-def translate_entry(client, entry, system_prompt):
-    
+def _translation_messages(entry, system_prompt):
     USER_PROMPT = f"""
         Translate this JSON:
         {json.dumps(entry, ensure_ascii=False, indent=2)}
         """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": USER_PROMPT}
+    ]
+
+
+def translate_entry(client, entry, system_prompt):
+    
     try:
         response = client.chat.completions.create(
             model=TRANSLATION_MODEL,
             temperature=0,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": USER_PROMPT}
-            ]
+            messages=_translation_messages(entry, system_prompt)
         )
         translated_content = response.choices[0].message.content
         translated_content = json_loads(translated_content)
@@ -61,6 +78,109 @@ def translate_entry(client, entry, system_prompt):
         logger.log_exception(error, context="openai request")
         raise error
 
+
+async def translate_entry_async(client, semaphore, entry, system_prompt):
+    """translate_entry for openai.AsyncOpenAI, the semaphore bounds concurrent requests"""
+    try:
+        async with semaphore:
+            response = await client.chat.completions.create(
+                model=TRANSLATION_MODEL,
+                temperature=0,
+                messages=_translation_messages(entry, system_prompt)
+            )
+        translated_content = response.choices[0].message.content
+        translated_content = json_loads(translated_content)
+        return translated_content
+
+    except Exception as error:
+        logger.log_exception(error, context="openai request")
+        raise error
+
+
+def _batch_messages(entries, system_prompt):
+    batch = {str(index): entry for index, entry in enumerate(entries)}
+    USER_PROMPT = f"""
+        Translate every entry of this JSON object separately.
+        Return a JSON object with exactly the same keys, each value being the translation of that entry:
+        {json.dumps(batch, ensure_ascii=False)}
+        """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": USER_PROMPT}
+    ]
+
+
+def _unpack_batch(translated_content, entries):
+    """Translations in entry order, None if the answer doesn't match the batch"""
+    if not isinstance(translated_content, dict):
+        return None
+
+    translations = []
+    for index, entry in enumerate(entries):
+        translated = translated_content.get(str(index))
+        if translated is None or (isinstance(entry, list) and not isinstance(translated, list)):
+            return None
+        translations.append(translated)
+    return translations
+
+
+async def translate_batch_async(client, semaphore, entries, system_prompt):
+    """
+    Translate several entries with one JSON mode request.
+
+    Falls back to one request per entry when the batch request fails or its
+    answer doesn't match the batch. Returns a list aligned with entries,
+    failed entries are returned as their exception.
+    """
+    if len(entries) > 1:
+        try:
+            async with semaphore:
+                response = await client.chat.completions.create(
+                    model=TRANSLATION_MODEL,
+                    temperature=0,
+                    response_format={"type": "json_object"},
+                    messages=_batch_messages(entries, system_prompt)
+                )
+            translations = _unpack_batch(json_loads(response.choices[0].message.content), entries)
+            if translations is not None:
+                return translations
+            logger.warning(f"Batch translation didn't match {len(entries)} entries, translating one by one")
+
+        except Exception as error:
+            logger.warning(f"Batch translation of {len(entries)} entries failed ({error}), translating one by one")
+
+    return await asyncio.gather(
+        *[translate_entry_async(client, semaphore, entry, system_prompt) for entry in entries],
+        return_exceptions=True
+    )
+
+
+async def _translate_entries_async(entries, system_prompt):
+    client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=OPENAI_MAX_RETRIES)
+    semaphore = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+    batches = [entries[start:start + TRANSLATION_BATCH_SIZE]
+               for start in range(0, len(entries), TRANSLATION_BATCH_SIZE)]
+    try:
+        results = await asyncio.gather(
+            *[translate_batch_async(client, semaphore, batch, system_prompt) for batch in batches]
+        )
+        return [translation for batch_result in results for translation in batch_result]
+    finally:
+        await client.close()
+
+
+def translate_entries(entries, system_prompt):
+    """
+    Translate entries concurrently, TRANSLATION_BATCH_SIZE entries per request
+    (up to TRANSLATION_CONCURRENCY requests in flight).
+
+    Returns a list aligned with entries, failed requests are returned as their exception.
+    """
+    if not entries:
+        return []
+    return asyncio.run(_translate_entries_async(entries, system_prompt))
+
+
 def translate_product_data(product_data_to_translate):
 
     
@@ -71,16 +191,17 @@ def translate_product_data(product_data_to_translate):
             "Return the list in the same order."
             )
 
-    for product_url, title_chn, product_attributes_chn, text_details_chn in product_data_to_translate:
-
-        # gathering content to list for translation
-        entry = [title_chn, product_attributes_chn, text_details_chn]
+    # gathering content to list for translation, all products are translated concurrently
+    entries = [[title_chn, product_attributes_chn, text_details_chn]
+               for _, title_chn, product_attributes_chn, text_details_chn in product_data_to_translate]
+    translations = translate_entries(entries, system_prompt=SYSTEM_PROMPT)
 
-        # creating openai client
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    for (product_url, title_chn, product_attributes_chn, text_details_chn), translated_data in zip(
+            product_data_to_translate, translations):
 
-        # taking translated content
-        translated_data = translate_entry(client=client, system_prompt=SYSTEM_PROMPT, entry=entry)
+        # taking translated content (results are stored in order, stop at the first failed request)
+        if isinstance(translated_data, BaseException):
+            raise translated_data
         if translated_data:
             print(translated_data)
 
@@ -88,9 +209,7 @@ def translate_product_data(product_data_to_translate):
             print("TITLE CHN", title_chn)
             # polishing translated data
             title_en = translated_data[0]
-            if title_en:
-                title_en = title_en.replace("'", "''")
-            
+
             product_attributes_en = translated_data[1]
             if product_attributes_en:
                 product_attributes_en = parse_json_with_duplicates(product_attributes_en)
@@ -98,9 +217,6 @@ def translate_product_data(product_data_to_translate):
 
             text_details_en = translated_data[2]
             if text_details_en:
-                if type(text_details_en) == str:
-                    text_details_en = text_details_en.replace("'", "''")
-                    
                 text_details_en = json_dumps(text_details_en)
 
         # writing translations to db
@@ -129,18 +245,19 @@ def translate_product_img_texts(img_details_to_translate):
         "Translate all Chinese text in this list to English."
     )
     
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    translations = translate_entries([image_text for _, image_text in img_details_to_translate],
+                                     system_prompt=SYSTEM_PROMPT)
 
-    for image_url, image_text in img_details_to_translate:
+    for (image_url, image_text), translated_data in zip(img_details_to_translate, translations):
 
         print(image_text)
         print("-"*100)
 
-        translated_data = translate_entry(system_prompt=SYSTEM_PROMPT, entry=image_text, client=client)
+        # results are stored in order, stop at the first failed request
+        if isinstance(translated_data, BaseException):
+            raise translated_data
         print(translated_data)
         print("="*100)
-        if translated_data:
-            translated_data = [line.replace("'", "''") for line in translated_data]
 
         update_row(
             db=DB_NAME,
@@ -1,23 +1,106 @@
 import os
 import sys
 import json
-import time
+import queue
+import gc
+import atexit
+import signal
+import threading
+import contextlib
 import multiprocessing
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Imported once at module load (inherited by forked workers), the Tesseract
+# fallback still works when PaddleOCR can't be imported
+os.environ.setdefault('KMP_DUPLICATE_LIB_OK', 'TRUE')  # Must be set before paddle loads OpenMP
+try:
+    from paddleocr import PaddleOCR
+except ImportError:
+    PaddleOCR = None
 
 # Add paths
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from ocr.pytsrct_ocr import is_text_present
-from utils.db_utils import update_row
-from utils.constants import DB_NAME, TABLE_PRODUCT_IMAGES, LOCAL_IMAGES_FOLDER, LOCAL_OUTPUT_FOLDER
+from ocr.pytsrct_ocr import is_text_present, load_image, text_lines, to_pil
+from utils.db_utils import update_row, update_many
+from utils.constants import (DB_NAME,
+                             TABLE_PRODUCT_IMAGES,
+                             LOCAL_IMAGES_FOLDER,
+                             LOCAL_OUTPUT_FOLDER,
+                             OCR_DET_MODEL_DIR,
+                             OCR_REC_MODEL_DIR,
+                             OCR_CLS_MODEL_DIR
+                             )
 from utils.log_config import get_logger
 
 logger = get_logger("paddle_ocr", "app.log")
 
 # Global PaddleOCR instance to avoid re-initialization
 _paddleocr_instance = None
-_ocr_lock = multiprocessing.Lock()
+
+# Persistent OCR workers: single-process pools, each holding its own PaddleOCR.
+# Started lazily and reused across images, a stuck worker is replaced on its own.
+OCR_WORKERS = max(1, min(multiprocessing.cpu_count() // 2, 8))
+_idle_workers = None
+_live_workers = {}   # worker pool -> shared pid of its current process (set by _init_worker)
+_workers_lock = threading.Lock()
+
+# Math library threads per worker (oneDNN / MKL), the cores are split between workers.
+# Passed as cpu_threads: OMP_/MKL_NUM_THREADS would have to be set before paddle is
+# imported at module level (the workers inherit the import through fork)
+OCR_THREADS = max(1, multiprocessing.cpu_count() // OCR_WORKERS)
+
+# PaddleOCR instance owned by a pool worker process
+_worker_ocr = None
+
+# Number of images sent to the OCR worker in one round-trip
+OCR_BATCH_SIZE = 8
+
+# Recycle a worker process after about this many images: Paddle's memory
+# arena is only given back to the OS when the process exits
+OCR_RECYCLE_IMAGES = 200
+
+# Batched OCR results are written with one executemany / commit per this many images
+OCR_DB_FLUSH_ROWS = 50
+
+# Skip files larger than this (MB)
+MAX_IMAGE_SIZE_MB = 50
+
+
+def _paddleocr_options(**overrides):
+    """
+    Build the keyword arguments shared by every PaddleOCR instance.
+
+    oneDNN (MKLDNN) kernels are enabled so int8/slim models run on the
+    VNNI-capable CPU paths. Slim (quantized) model directories are used
+    when configured via OCR_DET_MODEL_DIR / OCR_REC_MODEL_DIR / OCR_CLS_MODEL_DIR,
+    otherwise PaddleOCR falls back to its default models.
+    """
+    options = {
+        "use_angle_cls": True,
+        "lang": "ch",
+        "use_space_char": True,
+        "show_log": False,       # Disable verbose logging
+        "use_gpu": False,        # Force CPU usage for stability
+        "enable_mkldnn": True,   # oneDNN kernels (int8 on VNNI CPUs)
+        "cpu_threads": OCR_THREADS,
+        # Small batches keep Paddle's memory arena small (~50 MiB instead of ~300 MiB),
+        # recognition runs sequentially on CPU anyway
+        "rec_batch_num": 1,
+        "cls_batch_num": 1,
+        "det_limit_side_len": 960,
+        "det_limit_type": "max",
+    }
+
+    for key, model_dir in (("det_model_dir", OCR_DET_MODEL_DIR),
+                           ("rec_model_dir", OCR_REC_MODEL_DIR),
+                           ("cls_model_dir", OCR_CLS_MODEL_DIR)):
+        if model_dir:
+            options[key] = model_dir
+
+    options.update(overrides)
+    return options
 
 
 def get_paddleocr_instance():
@@ -28,21 +111,12 @@ def get_paddleocr_instance():
         try:
             # Set environment variables for stability
             os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-            os.environ['OPENBLAS_NUM_THREADS'] = '1'
-            os.environ['MKL_NUM_THREADS'] = '1'
             
-            # Import and create PaddleOCR with minimal configuration
-            from paddleocr import PaddleOCR
+            if PaddleOCR is None:
+                raise ImportError("paddleocr is not installed")
             
             logger.info("Initializing PaddleOCR...")
-            _paddleocr_instance = PaddleOCR(
-                use_angle_cls=True, 
-                lang='ch', 
-                use_space_char=True,
-                show_log=False,  # Disable verbose logging
-                use_gpu=False,   # Force CPU usage for stability
-                cpu_threads=1    # Single thread to avoid conflicts
-            )
+            _paddleocr_instance = PaddleOCR(**_paddleocr_options())
             logger.info("PaddleOCR initialized successfully")
             
         except Exception as e:
@@ -52,30 +126,157 @@ def get_paddleocr_instance():
     return _paddleocr_instance
 
 
-def extract_text_safe(image_path, timeout=60):
-    """Extract text with timeout and crash protection"""
+def _init_worker(pid_slot):
+    """Pool initializer: load PaddleOCR once per worker process, its pid goes to pid_slot"""
+    global _worker_ocr
+
+    # A recycled process runs the initializer again, the parent always sees the current pid
+    pid_slot.value = os.getpid()
+
+    # Set environment variables in worker process
+    os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
     try:
-        # Check if text is present first (lightweight check)
-        if not is_text_present(image_path=image_path):
-            logger.info(f"No text detected in image: {image_path}")
-            return None
-        
-        # Use multiprocessing to isolate PaddleOCR
-        with multiprocessing.Pool(processes=1) as pool:
+        if PaddleOCR is None:
+            raise ImportError("paddleocr is not installed")
+        _worker_ocr = PaddleOCR(**_paddleocr_options())
+    except Exception as e:
+        # Don't raise here: a failing initializer makes the pool respawn workers forever
+        print(f"Worker OCR init error: {e}")  # Use print since logger might not work in subprocess
+        _worker_ocr = None
+
+
+def _start_worker():
+    """Start a persistent OCR worker process"""
+    logger.info("Starting persistent OCR worker...")
+    pid_slot = multiprocessing.Value("i", 0, lock=False)
+    worker = multiprocessing.Pool(processes=1, initializer=_init_worker, initargs=(pid_slot,),
+                                  maxtasksperchild=max(1, OCR_RECYCLE_IMAGES // OCR_BATCH_SIZE))
+    with _workers_lock:
+        _live_workers[worker] = pid_slot
+    return worker
+
+
+def _stop_worker(worker):
+    """Terminate a persistent OCR worker process"""
+    with _workers_lock:
+        _live_workers.pop(worker, None)
+    worker.terminate()
+    worker.join()
+
+
+def _kill_worker(worker):
+    """SIGKILL a stuck OCR worker (native code may ignore SIGTERM), then reap it"""
+    with _workers_lock:
+        pid_slot = _live_workers.pop(worker, None)
+    if pid_slot is not None and pid_slot.value:
+        try:
+            os.kill(pid_slot.value, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except OSError:
+            pass  # Already gone
+    worker.terminate()
+    worker.join()
+
+
+def _get_idle_workers():
+    """Queue of idle workers (None slots are started on first use)"""
+    global _idle_workers
+
+    with _workers_lock:
+        if _idle_workers is None:
+            _idle_workers = queue.Queue()
+            for _ in range(OCR_WORKERS):
+                _idle_workers.put(None)
+        return _idle_workers
+
+
+def _run_in_worker(func, args, timeout):
+    """Run func in an idle persistent worker, the worker is replaced on timeout or crash"""
+    idle_workers = _get_idle_workers()
+    worker = idle_workers.get()
+    try:
+        if worker is None:
+            worker = _start_worker()
+        return worker.apply_async(func, args).get(timeout=timeout)
+    except multiprocessing.TimeoutError:
+        # Worker is still busy with the stuck task, kill it and replace it lazily
+        _kill_worker(worker)
+        worker = None
+        raise
+    except BaseException:
+        # Broken worker, replace it lazily
+        if worker is not None:
+            _stop_worker(worker)
+        worker = None
+        raise
+    finally:
+        idle_workers.put(worker)
+
+
+def _close_workers():
+    """Terminate all persistent OCR workers (they are restarted on next use)"""
+    global _idle_workers
+
+    with _workers_lock:
+        workers = list(_live_workers)
+        _live_workers.clear()
+        _idle_workers = None
+
+    for worker in workers:
+        worker.terminate()
+        worker.join()
+
+
+atexit.register(_close_workers)
+
+
+@contextlib.contextmanager
+def _alarm_timeout(seconds):
+    """Raise TimeoutError after `seconds` via SIGALRM (main thread on POSIX only, otherwise no limit)"""
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _on_alarm(signum, frame):
+        raise TimeoutError(f"OCR took longer than {seconds}s")
+
+    previous_handler = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def extract_text_safe(image_path, timeout=60, in_process=False):
+    """
+    Extract text with timeout and crash protection.
+
+    By default PaddleOCR runs in a persistent worker process (crash isolation,
+    a stuck worker is killed on timeout). With in_process=True the shared
+    instance of this process is used and the timeout is enforced with SIGALRM.
+    """
+    try:
+        if in_process:
             try:
-                result = pool.apply_async(extract_text_worker, (image_path,))
-                text_list = result.get(timeout=timeout)
-                return text_list
-            except multiprocessing.TimeoutError:
+                with _alarm_timeout(timeout):
+                    return _ocr_image(get_paddleocr_instance(), image_path)
+            except TimeoutError:
                 logger.warning(f"OCR timeout for image: {image_path}")
-                pool.terminate()
-                pool.join()
-                return None
-            except Exception as e:
-                logger.warning(f"OCR process error for {image_path}: {e}")
-                pool.terminate()
-                pool.join()
                 return None
+
+        # Text presence is checked inside the worker on the same decoded image
+        # Run PaddleOCR in the persistent worker process to isolate crashes
+        try:
+            text_list = _run_in_worker(extract_text_worker, (image_path,), timeout=timeout)
+            return text_list
+        except multiprocessing.TimeoutError:
+            logger.warning(f"OCR timeout for image: {image_path}")
+            return None
+        except Exception as e:
+            logger.warning(f"OCR process error for {image_path}: {e}")
+            return None
                 
     except Exception as e:
         logger.log_exception(e, f"OCR extraction for {image_path}")
@@ -83,39 +284,13 @@ def extract_text_safe(image_path, timeout=60):
 
 
 def extract_text_worker(image_path):
-    """Worker function for OCR extraction (runs in separate process)"""
+    """Worker function for OCR extraction (runs in the persistent worker process)"""
     try:
-        # Set environment variables in worker process
-        os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-        os.environ['OPENBLAS_NUM_THREADS'] = '1'
-        os.environ['MKL_NUM_THREADS'] = '1'
-        
-        # Import in worker process
-        from paddleocr import PaddleOCR
-        
-        # Create OCR instance in worker
-        ocr = PaddleOCR(
-            use_angle_cls=True, 
-            lang='ch', 
-            use_space_char=True,
-            show_log=False,
-            use_gpu=False,
-            cpu_threads=1
-        )
-        
-        # Perform OCR
-        results = ocr.ocr(image_path, cls=True)
-        
-        # Process results
-        text_list = []
-        if results and results[0]:  # Check if results exist
-            for line in results[0]:
-                if line and len(line) >= 2:  # Check line structure
-                    text = line[1][0] if isinstance(line[1], (list, tuple)) else str(line[1])
-                    if text and len(text.strip()) > 0:
-                        text_list.append(text.strip())
-        
-        return text_list
+        if _worker_ocr is None:
+            print("Worker OCR error: PaddleOCR is not initialized")
+            return None
+
+        return _ocr_image(_worker_ocr, image_path)
         
     except Exception as e:
         # Log error in worker process
@@ -123,23 +298,74 @@ def extract_text_worker(image_path):
         return None
 
 
+def _ocr_image(ocr, image_path):
+    """Decode once, run the text check and OCR on the same image (None if the check finds no text)"""
+    # Decode once, share the image between the text check and PaddleOCR
+    image = load_image(image_path)
+    if not is_text_present(image):
+        return None
+
+    # Perform OCR with the cached instance on the decoded BGR array
+    results = ocr.ocr(image, cls=True)
+
+    # Process results (in PaddleOCR's order, it already sorts the boxes top to bottom)
+    text_list = []
+    if results and results[0]:  # Check if results exist
+        for line in results[0]:
+            if line and len(line) >= 2:  # Check line structure
+                text = line[1][0] if isinstance(line[1], (list, tuple)) else str(line[1])
+                if text and len(text.strip()) > 0:
+                    text_list.append(text.strip())
+
+    return text_list
+
+
+def extract_text_batch_worker(image_paths):
+    """Worker function for batched OCR extraction, reuses the cached PaddleOCR instance"""
+    return [extract_text_worker(image_path) for image_path in image_paths]
+
+
+def _image_stat(image_path):
+    """
+    (exists, size in MB) of an image with one os.stat call.
+
+    Not cached: a missing image can be downloaded later in the same process.
+    """
+    try:
+        return True, os.stat(image_path).st_size / (1024 * 1024)
+    except FileNotFoundError:
+        return False, 0.0
+
+
+def _is_ocr_candidate(image_path, stat):
+    """Existing image within the size limit, stat is its _image_stat() (missing files are reported by the caller)"""
+    exists, file_size = stat
+    if not exists:
+        return False
+
+    # Skip very large files
+    if file_size > MAX_IMAGE_SIZE_MB:
+        logger.warning(f"Skipping large image ({file_size:.1f}MB): {image_path}")
+        return False
+
+    return True
+
+
 def extract_text(image_path):
     """Main OCR function with fallback mechanisms"""
     try:
         logger.info(f"Starting OCR for: {image_path}")
         
-        # Verify image exists
-        if not os.path.exists(image_path):
+        # Verify image exists (one stat shared with the size check)
+        stat = _image_stat(image_path)
+        if not stat[0]:
             logger.error(f"Image file not found: {image_path}")
             return None
         
-        # Check file size (skip very large files)
-        file_size = os.path.getsize(image_path) / (1024 * 1024)  # MB
-        if file_size > 50:  # Skip files larger than 50MB
-            logger.warning(f"Skipping large image ({file_size:.1f}MB): {image_path}")
+        if not _is_ocr_candidate(image_path, stat):
             return None
         
-        # Try safe extraction with timeout
+        # Try safe extraction with timeout (text check + OCR run once in the worker)
         text_list = extract_text_safe(image_path, timeout=60)
         
         if text_list:
@@ -164,27 +390,13 @@ def extract_line_by_line(image_path):
         
         logger.info(f"Processing image: {image_path}")
         
-        # Check if text is present (lightweight check first)
-        if not is_text_present(image_path=image_path):
-            logger.info("No text detected in image")
-            return None
-        
-        # Extract text with crash protection
+        # Extract text with crash protection (text presence is checked in the worker)
         text_list = extract_text(image_path)
         
-        if text_list:
-            # Process and clean text
-            cleaned_lines = []
-            for text in text_list:
-                if text and len(text.strip()) > 0:
-                    # Basic cleaning
-                    cleaned_text = text.strip().replace('\n', ' ').replace('\r', ' ')
-                    if len(cleaned_text) > 0:
-                        cleaned_lines.append(cleaned_text)
-            
-            if cleaned_lines:
-                logger.info(f"Extracted {len(cleaned_lines)} lines of text")
-                return cleaned_lines
+        cleaned_lines = _clean_lines(text_list)
+        if cleaned_lines:
+            logger.info(f"Extracted {len(cleaned_lines)} lines of text")
+            return cleaned_lines
         
         logger.info("No valid text lines extracted")
         return None
@@ -194,6 +406,68 @@ def extract_line_by_line(image_path):
         return None
 
 
+def _clean_lines(text_list):
+    """Strip OCR text lines and flatten line breaks, None if nothing is left"""
+    if not text_list:
+        return None
+
+    cleaned_lines = []
+    for text in text_list:
+        if text and len(text.strip()) > 0:
+            # Basic cleaning
+            cleaned_text = text.strip().replace('\n', ' ').replace('\r', ' ')
+            if len(cleaned_text) > 0:
+                cleaned_lines.append(cleaned_text)
+
+    return cleaned_lines or None
+
+
+def extract_lines_batch(image_paths, timeout=60, stats=None):
+    """
+    Extract text lines from several images with a single OCR worker round-trip
+    (one per image when the batch round-trip fails).
+
+    stats are the _image_stat() results of image_paths when the caller already has them.
+    Returns a list aligned with image_paths, None for images without text.
+    """
+    text_lists = [None] * len(image_paths)
+    if stats is None:
+        stats = [_image_stat(image_path) for image_path in image_paths]
+
+    # Size check first, text presence is checked inside the worker
+    to_ocr = []
+    for index, (image_path, stat) in enumerate(zip(image_paths, stats)):
+        try:
+            if _is_ocr_candidate(image_path, stat):
+                to_ocr.append(index)
+        except Exception as e:
+            logger.log_exception(e, f"checking image {image_path}")
+
+    if not to_ocr:
+        return text_lists
+
+    # The whole batch shares one image's timeout: a batch that times out or kills
+    # the worker is retried image by image, so only the bad image is lost
+    try:
+        batch_texts = _run_in_worker(extract_text_batch_worker,
+                                     ([image_paths[i] for i in to_ocr],),
+                                     timeout=timeout)
+    except multiprocessing.TimeoutError:
+        logger.warning(f"OCR timeout for batch of {len(to_ocr)} images, retrying one by one")
+        batch_texts = None
+    except Exception as e:
+        logger.warning(f"OCR process error for batch of {len(to_ocr)} images ({e}), retrying one by one")
+        batch_texts = None
+
+    if batch_texts is None:
+        batch_texts = [extract_text_safe(image_paths[i], timeout=timeout) for i in to_ocr]
+
+    for index, text_list in zip(to_ocr, batch_texts):
+        text_lists[index] = _clean_lines(text_list)
+
+    return text_lists
+
+
 def process_single_image(image_url, image_filename):
     """Process a single image with comprehensive error handling"""
     try:
@@ -203,7 +477,7 @@ def process_single_image(image_url, image_filename):
         image_path = os.path.join(LOCAL_OUTPUT_FOLDER, LOCAL_IMAGES_FOLDER, image_filename)
         
         # Verify image exists
-        if not os.path.exists(image_path):
+        if not _image_stat(image_path)[0]:
             logger.error(f"Image file not found: {image_path}")
             # Mark as processed even if file missing
             update_row(
@@ -217,36 +491,7 @@ def process_single_image(image_url, image_filename):
         # Extract text with timeout protection
         text_list = extract_line_by_line(image_path)
         
-        # Prepare text for database
-        if text_list:
-            # Clean text for database storage
-            cleaned_text_list = []
-            for text in text_list:
-                # Replace single quotes for SQL safety
-                clean_text = text.replace("'", "''")
-                cleaned_text_list.append(clean_text)
-            
-            # Update database with extracted text
-            update_row(
-                db=DB_NAME,
-                table=TABLE_PRODUCT_IMAGES,
-                column_with_value=[
-                    ("image_text", json.dumps(cleaned_text_list, ensure_ascii=False)),
-                    ("text_extracted_status", "1")
-                ],
-                where=[("image_url", "=", image_url)]
-            )
-            logger.info(f"Successfully processed image: {image_filename}")
-            
-        else:
-            # No text found, but mark as processed
-            update_row(
-                db=DB_NAME,
-                table=TABLE_PRODUCT_IMAGES,
-                column_with_value=[("text_extracted_status", "1")],
-                where=[("image_url", "=", image_url)]
-            )
-            logger.info(f"No text found in image: {image_filename}")
+        save_image_text(image_url, image_filename, text_list)
         
         return True
         
@@ -267,6 +512,109 @@ def process_single_image(image_url, image_filename):
         return False
 
 
+def _image_text_json(text_list):
+    """Compact JSON for the image_text column"""
+    return json.dumps(text_list, ensure_ascii=False, separators=(",", ":"))
+
+
+def save_image_text(image_url, image_filename, text_list):
+    """Store extracted text lines for an image and mark it as processed"""
+    if text_list:
+        # Update database with extracted text (bound parameters, no SQL quote escaping needed)
+        update_many(
+            db=DB_NAME,
+            table=TABLE_PRODUCT_IMAGES,
+            set_columns=["image_text", "text_extracted_status"],
+            where_columns=["image_url"],
+            data=[(_image_text_json(text_list), "1", image_url)]
+        )
+        logger.info(f"Successfully processed image: {image_filename}")
+
+    else:
+        # No text found, but mark as processed
+        update_row(
+            db=DB_NAME,
+            table=TABLE_PRODUCT_IMAGES,
+            column_with_value=[("text_extracted_status", "1")],
+            where=[("image_url", "=", image_url)]
+        )
+        logger.info(f"No text found in image: {image_filename}")
+
+
+def _batch_image_paths(batch):
+    """Local image paths for a chunk of (image_url, image_filename)"""
+    return [os.path.join(LOCAL_OUTPUT_FOLDER, LOCAL_IMAGES_FOLDER, image_filename)
+            for _, image_filename in batch]
+
+
+def _ocr_batch(batch):
+    """OCR a chunk of (image_url, image_filename): (image stats, text lists), each image is stat'ed once"""
+    image_paths = _batch_image_paths(batch)
+    stats = [_image_stat(image_path) for image_path in image_paths]
+    return stats, extract_lines_batch(image_paths, stats=stats)
+
+
+def save_image_batch(batch, stats, text_lists, pending_texts, pending_status):
+    """
+    Buffer OCR results of a chunk of (image_url, image_filename), returns success flags.
+    stats are the _image_stat() results the batch was OCR'ed with.
+
+    Rows are appended to pending_texts as (image_text, status, image_url) and to
+    pending_status as (status, image_url), see _flush_image_updates.
+    """
+    results = [False] * len(batch)
+
+    for index, ((image_url, image_filename), image_path, (exists, _), text_list) in enumerate(
+            zip(batch, _batch_image_paths(batch), stats, text_lists)):
+        try:
+            # Verify image exists
+            if not exists:
+                logger.error(f"Image file not found: {image_path}")
+                # Mark as processed even if file missing
+                pending_status.append(("1", image_url))
+                continue
+
+            if text_list:
+                # Values are bound as parameters, no SQL quote escaping needed
+                pending_texts.append((_image_text_json(text_list), "1", image_url))
+                logger.info(f"Successfully processed image: {image_filename}")
+            else:
+                # No text found, but mark as processed
+                pending_status.append(("1", image_url))
+                logger.info(f"No text found in image: {image_filename}")
+            results[index] = True
+        except Exception as e:
+            logger.log_exception(e, f"saving text for image {image_filename}")
+
+            # Mark as processed even on error to avoid infinite retries
+            pending_status.append(("1", image_url))
+
+    return results
+
+
+def _flush_image_updates(pending_texts, pending_status):
+    """Write buffered OCR results, one transaction per kind of update, and clear the buffers"""
+    if pending_texts:
+        update_many(
+            db=DB_NAME,
+            table=TABLE_PRODUCT_IMAGES,
+            set_columns=["image_text", "text_extracted_status"],
+            where_columns=["image_url"],
+            data=pending_texts
+        )
+        pending_texts.clear()
+
+    if pending_status:
+        update_many(
+            db=DB_NAME,
+            table=TABLE_PRODUCT_IMAGES,
+            set_columns=["text_extracted_status"],
+            where_columns=["image_url"],
+            data=pending_status
+        )
+        pending_status.clear()
+
+
 def main(img_details):
     """Main OCR processing function with batch processing and error recovery"""
     try:
@@ -280,32 +628,39 @@ def main(img_details):
         success_count = 0
         error_count = 0
         
-        for i, (image_url, image_filename) in enumerate(img_details):
-            try:
-                logger.info(f"Processing image {i+1}/{len(img_details)}: {image_filename}")
-                
-                # Process single image with error isolation
-                success = process_single_image(image_url, image_filename)
-                
-                processed_count += 1
-                if success:
-                    success_count += 1
-                else:
-                    error_count += 1
-                
-                # Small delay between images to prevent system overload
-                time.sleep(0.5)
-                
-                # Progress logging
-                if processed_count % 10 == 0:
+        batches = [img_details[start:start + OCR_BATCH_SIZE]
+                   for start in range(0, len(img_details), OCR_BATCH_SIZE)]
+        
+        # DB updates are buffered and written every OCR_DB_FLUSH_ROWS images
+        pending_texts = []
+        pending_status = []
+        
+        # OCR runs on the persistent workers concurrently, DB writes stay on this thread
+        with ThreadPoolExecutor(max_workers=OCR_WORKERS * 2) as executor:
+            ocr_results = executor.map(_ocr_batch, batches)
+            
+            for batch, (stats, text_lists) in zip(batches, ocr_results):
+                try:
+                    results = save_image_batch(batch, stats, text_lists, pending_texts, pending_status)
+                    if len(pending_texts) + len(pending_status) >= OCR_DB_FLUSH_ROWS:
+                        _flush_image_updates(pending_texts, pending_status)
+                    
+                    processed_count += len(batch)
+                    success_count += sum(results)
+                    error_count += len(results) - sum(results)
+                    
+                    # Progress logging
                     logger.info(f"Progress: {processed_count}/{len(img_details)} images processed")
-                
-            except Exception as e:
-                logger.log_exception(e, f"processing batch item {i+1}")
-                error_count += 1
-                
-                # Continue with next image
-                continue
+                    
+                except Exception as e:
+                    logger.log_exception(e, f"processing batch at item {processed_count+1}")
+                    processed_count += len(batch)
+                    error_count += len(batch)
+                    
+                    # Continue with next batch
+                    continue
+        
+        _flush_image_updates(pending_texts, pending_status)
         
         # Final summary
         logger.info(f"OCR processing completed:")
@@ -323,10 +678,13 @@ def cleanup_ocr_resources():
     global _paddleocr_instance
     
     try:
+        _close_workers()
+
         if _paddleocr_instance is not None:
             # Clear the instance
             _paddleocr_instance = None
-            logger.info("OCR resources cleaned up")
+            gc.collect()
+        logger.info("OCR resources cleaned up")
     except Exception as e:
         logger.warning(f"Error cleaning up OCR resources: {e}")
 
@@ -336,17 +694,13 @@ def test_ocr_functionality():
     try:
         logger.info("Testing OCR functionality...")
         
-        # Try to import PaddleOCR
-        from paddleocr import PaddleOCR
+        # Check the module level import
+        if PaddleOCR is None:
+            raise ImportError("paddleocr is not installed")
         logger.info("PaddleOCR import successful")
         
         # Try to create instance
-        ocr = PaddleOCR(
-            use_angle_cls=False, 
-            lang='ch', 
-            show_log=False,
-            use_gpu=False
-        )
+        ocr = PaddleOCR(**_paddleocr_options(use_angle_cls=False))
         logger.info("PaddleOCR instance created successfully")
         
         return True
@@ -366,32 +720,25 @@ def signal_handler(signum, frame):
 
 # Register signal handlers if running as main process
 if __name__ == "__main__":
-    import signal
     signal.signal(signal.SIGTERM, signal_handler)
     signal.signal(signal.SIGINT, signal_handler)
 
 
 # Alternative OCR function using Tesseract as fallback
 def extract_text_tesseract_fallback(image_path):
-    """Fallback OCR using Tesseract if PaddleOCR fails"""
+    """Fallback OCR using Tesseract if PaddleOCR fails (full resolution image)"""
     try:
         import pytesseract
-        from PIL import Image
         
         logger.info(f"Using Tesseract fallback for: {image_path}")
         
-        # Open image
-        image = Image.open(image_path)
+        image = load_image(image_path)
         
         # Extract text
-        text = pytesseract.image_to_string(image, lang='chi_sim+eng')
-        
-        if text and len(text.strip()) > 0:
-            # Split into lines and clean
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            return lines
+        text = pytesseract.image_to_string(to_pil(image), lang='chi_sim+eng')
         
-        return None
+        # Split into lines and clean
+        return text_lines(text) or None
         
     except Exception as e:
         logger.warning(f"Tesseract fallback failed: {e}")
@@ -401,13 +748,13 @@ def extract_text_tesseract_fallback(image_path):
 def extract_text_with_fallback(image_path):
     """Extract text with PaddleOCR and Tesseract fallback"""
     try:
-        # Try PaddleOCR first
+        # Try PaddleOCR first (the downsampled text check only gates it)
         text_list = extract_text(image_path)
         
         if text_list and len(text_list) > 0:
             return text_list
         
-        # If PaddleOCR fails or returns no text, try Tesseract
+        # If PaddleOCR fails, times out or returns no text, run full resolution Tesseract
         logger.info("Trying Tesseract fallback...")
         tesseract_result = extract_text_tesseract_fallback(image_path)
         
@@ -1,13 +1,87 @@
+import cv2
+import numpy as np
 from PIL import Image
 import pytesseract
 
+# Cheap pre-check thresholds (on a 256x256 grayscale copy):
+# flat images without contrast or edges can't contain text
+MIN_CONTRAST = 5.0
+MIN_EDGE_DENSITY = 1.0
 
-def is_text_present(image_path, min_chars=10):
+# Tesseract only has to decide "text or not": a downscaled copy is enough,
+# single block layout (psm 6) + LSTM engine only (oem 1)
+MAX_CHECK_SIDE = 1024
+TESSERACT_LANG = "eng+chi_sim"
+TESSERACT_CONFIG = "--psm 6 --oem 1"
+
+
+def load_image(image_path):
+    """
+    Decode an image once so it can be shared by the text check and OCR.
+
+    Returns a BGR ndarray (what PaddleOCR works on), np.fromfile also handles
+    unicode paths on Windows where cv2.imread fails.
+    """
+    image = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Can't decode image: {image_path}")
+    return image
+
+
+def to_pil(image):
+    """RGB PIL copy of a BGR ndarray (for Tesseract)"""
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def has_text_features(image):
+    """Variance / edge density heuristic, O(64k) pixels instead of a full OCR pass"""
+    gray = cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), (256, 256),
+                      interpolation=cv2.INTER_AREA).astype(np.int16)
+    if gray.std() < MIN_CONTRAST:
+        return False
+
+    return np.abs(np.diff(gray, axis=0)).mean() >= MIN_EDGE_DENSITY
+
+
+def downsample(image, max_side=MAX_CHECK_SIDE):
+    """Downscaled copy for the text check, the original image is left untouched (it is reused for OCR)"""
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image
+
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def is_text_present(image, min_chars=10):
+    """
+    Check whether an image contains text.
+
+    Args:
+        image (str | np.ndarray): Path to the image or an already decoded (BGR) image.
+        min_chars (int): Minimum number of recognized characters.
+
+    Returns:
+        bool: True if at least min_chars characters were recognized.
+    """
 
     # For windows machine tesseract.exe path
     # pytesseract.pytesseract.tesseract_cmd = r"C:\Users\Administrator\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
 
-    text = pytesseract.image_to_string(Image.open(image_path))
+    if not isinstance(image, np.ndarray):
+        image = load_image(image)
+
+    # Blank / flat images skip Tesseract entirely
+    if not has_text_features(image):
+        return False
+
+    text = pytesseract.image_to_string(to_pil(downsample(image)), lang=TESSERACT_LANG, config=TESSERACT_CONFIG)
     return len(text.strip()) >= min_chars
 
 
+def text_lines(raw_text):
+    """Non-empty, stripped lines of a Tesseract result"""
+    if not raw_text:
+        return []
+    return [line.strip() for line in raw_text.split("\n") if line.strip()]
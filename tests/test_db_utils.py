@@ -0,0 +1,26 @@
+import sqlite3
+
+import pytest
+
+from utils.db_utils import fetch_many
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "test.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.executemany("INSERT INTO items (id, name) VALUES (?, ?)",
+                               [(1, "a"), (2, "b"), (3, "c")])
+    return path
+
+
+def test_fetch_many_in_scalar(db):
+    rows = fetch_many(db=db, table="items", columns_list=["id"], where=[("name", "IN", "b")])
+    assert rows == [(2,)]
+
+
+def test_fetch_many_in_list(db):
+    rows = fetch_many(db=db, table="items", columns_list=["id"],
+                      where=[("name", "IN", ["a", "c"])], order_by=[("id", "ASC")])
+    assert rows == [(1,), (3,)]
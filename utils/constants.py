@@ -2,6 +2,14 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+
+def _bool(value, default=False):
+    """Boolean env var: "1", "true", "yes", "on" (any case) are True, unset gives default"""
+    if value is None:
+        return default
+    return str(value).strip().lower() in {"1", "true", "yes", "on"}
+
+
 # db 
 DB_NAME=os.getenv("LOCAL_DB", "product_data.db")
 TABLE_PRODUCT_DATA=os.getenv("TABLE_PRODUCT_DATA", "product_data")
@@ -15,8 +23,21 @@ GD_IMAGES_FOLDER=os.getenv("GD_IMAGES_FOLDER", "images")
 
 # env & task vars
 ENV=os.getenv("ENV", "dev")
-HEADLESS=os.getenv("HEADLESS", False)
+HEADLESS=_bool(os.getenv("HEADLESS"), True)
+SCRAPER_DRIVERS=int(os.getenv("SCRAPER_DRIVERS", 4))  # parallel Chrome instances (~300MB RAM each)
+SCRAPER_HTTP_FAST=_bool(os.getenv("SCRAPER_HTTP_FAST"), False)  # opt-in: try plain HTTP (sent without a proxy) before Chrome
 TRANSLATION_MODEL=os.getenv("TRANSLATION_MODEL", "gpt-3.5-turbo")
+TRANSLATION_CONCURRENCY=int(os.getenv("TRANSLATION_CONCURRENCY", 8))  # parallel OpenAI requests
+DOWNLOAD_CONCURRENCY=int(os.getenv("DOWNLOAD_CONCURRENCY", 8))  # parallel image downloads
+DOWNLOAD_RATE=float(os.getenv("DOWNLOAD_RATE", 2))  # image requests per second (halved on 429 / 403)
+DOWNLOAD_BURST=int(os.getenv("DOWNLOAD_BURST", 5))  # requests allowed at once after an idle spell
+UPLOAD_WORKERS=int(os.getenv("UPLOAD_WORKERS", 4))  # parallel Google Drive uploads
+DOWNLOAD_USE_PROXY=_bool(os.getenv("DOWNLOAD_USE_PROXY"), False)  # download images through the Oxylabs proxy
+
+# ocr (optional slim/quantized PaddleOCR inference models, paddle defaults if unset)
+OCR_DET_MODEL_DIR=os.getenv("OCR_DET_MODEL_DIR") or None
+OCR_REC_MODEL_DIR=os.getenv("OCR_REC_MODEL_DIR") or None
+OCR_CLS_MODEL_DIR=os.getenv("OCR_CLS_MODEL_DIR") or None
 # tokens & ids
 OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "default_openai_token")
 NOTION_BEARER_TOKEN=os.getenv("NOTION_BEARER_TOKEN", "default_notion_token")
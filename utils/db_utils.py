@@ -1,11 +1,262 @@
+import os
+import re
 import sqlite3
-from typing import List, Tuple, Union, Dict
-import traceback  # bu juda foydali
+import atexit
+import functools
+import itertools
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Tuple, Union, Dict, Iterable, Iterator, Optional, Sequence, Sized
+import logging
 from logging import Logger
 import time
 from utils.log_config import get_logger
 
 
+# Fallback logger of every helper (logger=None)
+_DEFAULT_LOGGER = get_logger("db", "app.log")
+
+# Open with_transaction() block of the current thread: (db, connection)
+_local = threading.local()
+
+# Cached connections: (db, thread id, readonly) -> connection, see _get_conn()
+_CONN_CACHE: Dict[Tuple[str, int, bool], sqlite3.Connection] = {}
+_CONN_LOCK = threading.Lock()
+
+# Seconds between background WAL checkpoints, see _checkpoint_loop()
+WAL_CHECKPOINT_INTERVAL = 60
+_checkpoint_thread: Optional[threading.Thread] = None
+_checkpoint_stop = threading.Event()
+
+# Connections a forked child inherited from its parent, see _reset_after_fork()
+_INHERITED_CONNS: List[Dict] = []
+
+
+def _reset_after_fork() -> None:
+    # A forked child (OCR worker pool) must not reuse the parent's connections,
+    # and the parent's checkpoint thread doesn't exist in the child. The inherited
+    # connections are not closed (nor garbage collected, which closes them too):
+    # they share the parent's file descriptors and locks, only the parent closes them
+    global _local, _CONN_CACHE, _CONN_LOCK, _checkpoint_thread, _checkpoint_stop
+    _INHERITED_CONNS.append(_CONN_CACHE)
+    _CONN_CACHE = {}
+    _CONN_LOCK = threading.Lock()
+    _local = threading.local()
+    _checkpoint_thread = None
+    _checkpoint_stop = threading.Event()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+# Applied to every new connection. WAL lets readers and the writer work concurrently,
+# synchronous=NORMAL fsyncs at checkpoints instead of every commit (still crash safe in WAL mode),
+# busy_timeout makes a locked database wait up to 30s instead of failing with SQLITE_BUSY,
+# wal_autocheckpoint backs up the background checkpoints (_checkpoint_loop)
+_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA wal_autocheckpoint=1000;
+    PRAGMA busy_timeout=30000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+"""
+
+# Read-only connections can't change the journal mode (the writer already set WAL)
+_READ_PRAGMAS = """
+    PRAGMA busy_timeout=30000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+"""
+
+
+def _open(db: str, readonly: bool = False) -> sqlite3.Connection:
+    """New connection with the tuned PRAGMAs (64MB page cache, 256MB memory mapped reads)"""
+    # check_same_thread=False only so connections of finished threads can be closed from
+    # another thread, a connection is otherwise only used by the thread that opened it.
+    # isolation_level=None: the sqlite3 module doesn't open transactions behind our back,
+    # writes are wrapped in explicit BEGIN IMMEDIATE / COMMIT by with_transaction()
+    if readonly:
+        connection = sqlite3.connect(f"{Path(db).resolve().as_uri()}?mode=ro", uri=True,
+                                     timeout=30, check_same_thread=False, isolation_level=None)
+        connection.executescript(_READ_PRAGMAS)
+    else:
+        connection = sqlite3.connect(db, timeout=30, check_same_thread=False, isolation_level=None)
+        connection.executescript(_PRAGMAS)
+    return connection
+
+
+def _get_conn(db: str, readonly: bool = False) -> sqlite3.Connection:
+    """
+    Connection of the current thread to db, opened once and reused by every helper call.
+
+    Connections are cached per (db, thread) since sqlite3 connections must not be used
+    by two threads at once. Each thread has a read-write connection for the writers and
+    a read-only one (readonly=True) for fetch_many, in WAL mode the readers never wait
+    for the writer. Connections left behind by finished threads are closed when a new
+    one is opened, the rest at interpreter exit.
+    """
+    key = (db, threading.get_ident(), readonly)
+    connection = _CONN_CACHE.get(key)
+    if connection is not None:
+        return connection
+
+    global _checkpoint_thread
+    connection = _open(db, readonly)
+    with _CONN_LOCK:
+        alive = {thread.ident for thread in threading.enumerate()}
+        for stale_key in [cached_key for cached_key in _CONN_CACHE if cached_key[1] not in alive]:
+            _CONN_CACHE.pop(stale_key).close()
+        _CONN_CACHE[key] = connection
+
+        if _checkpoint_thread is None:
+            _checkpoint_thread = threading.Thread(target=_checkpoint_loop, name="wal-checkpoint", daemon=True)
+            _checkpoint_thread.start()
+    return connection
+
+
+def _checkpoint_loop() -> None:
+    """
+    Every WAL_CHECKPOINT_INTERVAL seconds copy the WAL back into each open database
+    and truncate it. Long running processes keep read connections open, which can
+    keep the automatic checkpoints from ever resetting the WAL, so it would grow
+    without bound.
+
+    The thread checkpoints through its own connections (the cached ones belong to
+    their threads), one per database, opened once and closed when close_connections()
+    stops the loop. A short busy timeout skips a checkpoint blocked by an active
+    reader or writer, it's retried on the next round.
+    """
+    stop = _checkpoint_stop
+    connections: Dict[str, sqlite3.Connection] = {}
+    try:
+        while not stop.wait(WAL_CHECKPOINT_INTERVAL):
+            with _CONN_LOCK:
+                dbs = {db for db, _, readonly in _CONN_CACHE if not readonly}
+
+            for db in dbs:
+                try:
+                    connection = connections.get(db)
+                    if connection is None:
+                        connection = connections[db] = sqlite3.connect(db, timeout=1)
+                    connection.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchall()
+                except sqlite3.Error:
+                    pass
+    finally:
+        for connection in connections.values():
+            connection.close()
+
+
+@atexit.register
+def close_connections() -> None:
+    """Stop the checkpoint thread (closing its connections) and close every cached connection"""
+    global _checkpoint_thread, _checkpoint_stop
+    _checkpoint_stop.set()
+    if _checkpoint_thread is not None:
+        _checkpoint_thread.join(timeout=5)
+    # a later _get_conn() starts a new checkpoint thread
+    _checkpoint_thread = None
+    _checkpoint_stop = threading.Event()
+
+    with _CONN_LOCK:
+        while _CONN_CACHE:
+            _, connection = _CONN_CACHE.popitem()
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+
+
+@contextmanager
+def with_transaction(db: str):
+    """
+    Run every db helper called by this thread inside one transaction.
+
+    The helpers (update_row, insert_many, fetch_many, ...) reuse the transaction's
+    connection and skip their own commits, so a sequence of writes costs a single
+    COMMIT instead of one per statement. Rolled back on error.
+    Nested blocks on the same db join the outer transaction.
+
+    Example:
+        with with_transaction(DB_NAME):
+            update_row(...)
+            insert_many(...)
+    """
+    transaction = getattr(_local, "transaction", None)
+    if transaction is not None and transaction[0] == db:
+        yield transaction[1]
+        return
+
+    connection = _get_conn(db)
+    # IMMEDIATE takes the write lock up front: concurrent writers wait for it
+    # (busy timeout) instead of failing on a read -> write lock upgrade
+    connection.execute("BEGIN IMMEDIATE;")
+    _local.transaction = (db, connection)
+    try:
+        yield connection
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK;")
+        raise
+    else:
+        connection.execute("COMMIT;")
+    finally:
+        _local.transaction = transaction
+
+
+@contextmanager
+def _connection(db: str, readonly: bool = False):
+    """
+    Connection for one helper call: the thread's open transaction (so reads see its
+    uncommitted writes), else its cached read-only connection for readonly calls or
+    its read-write connection inside a transaction of its own (committed on exit).
+    """
+    transaction = getattr(_local, "transaction", None)
+    if transaction is not None and transaction[0] == db:
+        yield transaction[1]
+        return
+
+    if readonly:
+        yield _get_conn(db, readonly=True)
+        return
+
+    with with_transaction(db) as connection:
+        yield connection
+
+
+# Table / column names are put in the SQL text as they are, only plain identifiers are accepted
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def _validate_ident(name: str) -> str:
+    """Return name if it is a plain SQL identifier, raise ValueError otherwise"""
+    if not isinstance(name, str) or not _IDENT_RE.fullmatch(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+
+# Values bound per insert_many chunk, just under SQLite's default host parameter limit (32766)
+MAX_BOUND_PARAMS = 32000
+
+# (table, columns, or_ignore) -> INSERT statement, same text for the same shape (SQLite statement cache hits)
+_INSERT_SQL_CACHE: Dict[Tuple[str, Tuple[str, ...], bool], str] = {}
+
+
+def _insert_sql(table: str, columns: Tuple[str, ...], or_ignore: bool = False) -> str:
+    key = (table, columns, or_ignore)
+    query = _INSERT_SQL_CACHE.get(key)
+    if query is None:
+        columns_text = ",".join(columns)
+        placeholders = ",".join(["?"]*len(columns))
+        query = _INSERT_SQL_CACHE[key] = (
+            f"INSERT {'OR IGNORE ' if or_ignore else ''}INTO {table} ({columns_text}) VALUES ({placeholders});"
+        )
+    return query
+
+
 def prepare_table(
         db: str, 
         table: str, 
@@ -16,6 +267,8 @@ def prepare_table(
     
     """
     Creates a SQLite table based on the given column definitions.
+    Columns missing from an existing table are added (ALTER TABLE ... ADD COLUMN).
+    Raises ValueError if the table or a column name isn't a plain identifier.
     
     Args:
         db (str): Path to the SQLite database file.
@@ -27,43 +280,39 @@ def prepare_table(
     Returns:
         bool: True if table was created successfully, False otherwise
     """
-    if logger is None:
-        logger = get_logger("db", "app.log")
+    logger = logger or _DEFAULT_LOGGER
 
     # Validate inputs
     if not db or not table or not columns_dict:
         logger.error("Invalid parameters: db, table, and columns_dict must be provided")
         return False
-        
+
+    # Names are interpolated into the SQL: reject anything that isn't a plain identifier
+    # before touching the database
+    _validate_ident(table)
+    columns_text = ",".join(["%s %s"%(_validate_ident(column_name), column_type)
+                             for column_name, column_type in columns_dict.items()])
+    create_table_query = f"CREATE TABLE IF NOT EXISTS {table} ({columns_text});"
+
     try:
-        with sqlite3.connect(db) as connection:
-            cursor = connection.cursor()
-            
+        # DROP and CREATE run in one transaction: a failing CREATE doesn't leave the table dropped
+        with _connection(db) as connection:
             if drop:
                 try:
-                    cursor.execute("DROP TABLE IF EXISTS %s;"%table)
-                    connection.commit()
+                    connection.execute("DROP TABLE IF EXISTS %s;"%table)
                     logger.info(f"❌DB: {db}, TABLE: {table} dropped")
                 except sqlite3.OperationalError as e:
                     logger.error(f"Failed to drop table {table}: {str(e)}")
                     raise
 
-            # Build columns string with validation
-            try:
-                columns_text = ",".join(["%s %s"%(column_name, column_type) 
-                                       for column_name, column_type in columns_dict.items()])
-            except Exception as e:
-                logger.error(f"Failed to build columns string: {str(e)}")
-                raise
-                
-            create_table_query = f"""
-                CREATE TABLE IF NOT EXISTS {table} (
-                {columns_text}
-                );
-            """
-            
-            cursor.execute(create_table_query)
-            connection.commit()
+            connection.execute(create_table_query)
+
+            # An existing table gets the columns added to columns_dict since it was created
+            existing_columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table});")}
+            for column_name, column_type in columns_dict.items():
+                if column_name not in existing_columns:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type};")
+                    logger.info(f"➕DB: {db}, TABLE: {table} column {column_name} added")
             logger.info(f"✅DB: {db}, TABLE: {table} created")
             return True
             
@@ -79,9 +328,6 @@ def prepare_table(
         logger.error(f"Unexpected error creating table {table}: {str(e)}")
         logger.log_exception(e, context="preparing tables")
         raise
-    finally:
-        cursor.close()
-        connection.close()
         
     return False
 
@@ -89,12 +335,13 @@ def insert_many(
         db: str, 
         table: str, 
         columns_list: List[str], 
-        data: List[Tuple], 
-        chunk_size: int = 1000, 
+        data: Iterable[Tuple], 
+        chunk_size: int = 10000, 
         delete: bool = False, 
         chunk_head: int = 0,
         logger: Logger = None,
-        max_retries: int = 3
+        max_retries: int = 3,
+        or_ignore: bool = False
     ) -> bool:
     
     """
@@ -104,100 +351,209 @@ def insert_many(
         db (str): Path to the SQLite database file.
         table (str): Name of the table to insert data into.
         columns_list (List[str]): List of column names.
-        data (List[Tuple]): Data to insert. Each tuple must match the column order.
-        chunk_size (int, optional): Number of rows to insert per chunk.
+        data (Iterable[Tuple]): Data to insert. Each tuple must match the column order.
+            Any iterable works (e.g. a generator), it is consumed one chunk at a time.
+            A locked database is only retried for sequences or before the first row was read.
+        chunk_size (int, optional): Upper bound of rows to insert per chunk, capped so a chunk
+            binds at most MAX_BOUND_PARAMS values.
         delete (bool, optional): If True, clears the table before inserting.
-        chunk_head (int, optional): Index of the chunk to start from.
+        chunk_head (int, optional): Number of leading rows to skip.
         logger (Logger, optional): Custom logger instance.
         max_retries (int, optional): Maximum number of retry attempts for transient errors.
+        or_ignore (bool, optional): If True, rows violating a UNIQUE constraint are skipped (INSERT OR IGNORE).
         
     Returns:
         bool: True if all data was inserted successfully, False otherwise
     """
-    if logger is None:
-        logger = get_logger("db", "app.log")
+    logger = logger or _DEFAULT_LOGGER
         
     # Validate inputs
     if not db or not table or not columns_list:
         logger.error("Invalid parameters: db, table, and columns_list must be provided")
         return False
         
-    if not data:
+    if isinstance(data, Sized) and not data:
         logger.warning(f"No data provided to insert into {table}")
         return True  # Nothing to do, but not an error
 
-    try:
-        with sqlite3.connect(db) as connection:
-            cursor = connection.cursor()
+    insert_query = _insert_sql(table, tuple(columns_list), or_ignore)
+    effective_chunk = min(chunk_size, max(1, MAX_BOUND_PARAMS // len(columns_list)))
+    logger.debug("DB: %s, TABLE: %s | chunk size %d", db, table, effective_chunk)
+    log_info = logger.isEnabledFor(logging.INFO)
 
-            if delete:
-                try:
-                    cursor.execute(f"DELETE FROM {table};")
-                    connection.commit()
-                    logger.info(f"❌DB: {db}, TABLE: {table} cleared")
-                except sqlite3.Error as e:
-                    logger.error(f"Failed to clear table {table}: {str(e)}")
+    try:
+        # Implement retry logic for transient errors: the whole call is one transaction
+        # (one commit for all chunks), a locked database rolls it back and starts it again
+        retries = 0
+        while True:
+            rows = iter(data)
+            consumed = False
+            try:
+                with with_transaction(db) as connection:
+                    if delete:
+                        connection.execute(f"DELETE FROM {table};")
+                        if log_info:
+                            logger.info("❌DB: %s, TABLE: %s cleared", db, table)
+
+                    # Process data in chunks, only one chunk is held in memory
+                    if chunk_head:
+                        rows = itertools.islice(rows, chunk_head, None)
+                    total = 0
+                    while True:
+                        data_chunk = list(itertools.islice(rows, effective_chunk))
+                        consumed = True
+                        if not data_chunk:
+                            break
+                        connection.executemany(insert_query, data_chunk)
+                        total += len(data_chunk)
+                        if log_info:
+                            logger.info("✅DB: %s, TABLE: %s | %d rows inserted (%d total)",
+                                        db, table, len(data_chunk), total)
+                return True
+
+            except sqlite3.OperationalError as e:
+                retries += 1
+                # a consumed iterator can't be replayed, the rolled back rows are gone
+                replayable = isinstance(data, Sequence) or not consumed
+                if "database is locked" in str(e) and retries <= max_retries and replayable:
+                    wait_time = 0.5 * (2 ** retries)  # Exponential backoff
+                    logger.warning(f"Database locked, retry {retries}/{max_retries} after {wait_time}s")
+                    time.sleep(wait_time)
+                else:
+                    logger.error(f"SQLite operational error: {str(e)}")
                     raise
-
-            # Process data in chunks
-            for i in range(chunk_head, len(data), chunk_size):
-                data_chunk = data[i:i + chunk_size]
-                
-                columns_text = ",".join(columns_list)
-                placeholders = ",".join(["?"]*len(columns_list))
-                
-                insert_query = f"""
-                    INSERT INTO {table} (
-                                {columns_text}
-                    ) VALUES ({placeholders});
-                """
-                
-                # Implement retry logic for transient errors
-                retries = 0
-                while retries <= max_retries:
-                    try:
-                        cursor.executemany(insert_query, data_chunk)
-                        connection.commit()
-                        logger.info(f"✅DB: {db}, TABLE: {table} | {len(data_chunk)} rows inserted")
-                        break
-                    except sqlite3.OperationalError as e:
-                        retries += 1
-                        if "database is locked" in str(e) and retries <= max_retries:
-                            wait_time = 0.5 * (2 ** retries)  # Exponential backoff
-                            logger.warning(f"Database locked, retry {retries}/{max_retries} after {wait_time}s")
-                            time.sleep(wait_time)
-                        else:
-                            logger.error(f"SQLite operational error: {str(e)}")
-                            raise
-                    except Exception as error:
-                        logger.error(f"Error inserting data chunk: {str(error)}")
-                        raise
-                        
-                if retries > max_retries:
-                    logger.error(f"Failed to insert chunk after {max_retries} retries")
-                    return False
-                    
-            return True
                 
     except Exception as error:
         logger.log_exception(error, context="inserting rows")
         raise
 
-    finally:
-        cursor.close()
-        connection.close()
-        
-    return False
 # TESTING insert_many
 # insert_many(db="test.db", table="test_table", columns_list=["id", "data"], delete=True, data=[(1, "men"), (2, "sen"), (3, "u")])
 
+def _where_text(where_shape: Tuple) -> str:
+    """
+    WHERE clause of a where shape: ((column, operator, inline), ...), inline is None for
+    a bound value ("?"), the SQL text for ::TYPE casts / NULL, a tuple of those for IN lists
+    """
+    clauses = []
+    for column, operator, inline in where_shape:
+        if type(inline) is tuple:
+            values_text = ", ".join(["?" if item is None else item for item in inline])
+            clauses.append(f"{column} {operator} ({values_text})")
+        else:
+            clauses.append(f"{column} {operator} {'?' if inline is None else inline}")
+    return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+@functools.lru_cache(maxsize=256)
+def _build_select(
+        table: str,
+        columns: Tuple[str, ...],
+        where_shape: Tuple,
+        order_by: Tuple[Tuple[str, str], ...],
+        has_limit: bool
+    ) -> str:
+    """
+    SELECT template of a fetch_many call shape. Calls differing only in their values
+    share the SQL text, so it is built once and SQLite's statement cache hits.
+    """
+    query = f"SELECT {', '.join(columns)} FROM {table}{_where_text(where_shape)}"
+    if order_by:
+        query += " ORDER BY " + " , ".join([f"{column} {direction}" for column, direction in order_by])
+    if has_limit:
+        query += " LIMIT ? OFFSET ?"
+    return query + ";"
+
+
+@functools.lru_cache(maxsize=256)
+def _build_update(table: str, set_shape: Tuple, where_shape: Tuple) -> str:
+    """UPDATE template of an update_row call shape, set_shape: ((column, inline), ...), see _where_text()"""
+    set_text = ", ".join([f"{column} = {'?' if inline is None else inline}" for column, inline in set_shape])
+    return f"UPDATE {table} SET {set_text}{_where_text(where_shape)};"
+
+
+def iter_fetch_many(
+        db: str,
+        table: str,
+        columns_list: List[str],
+        where: List[Tuple[str, str, str]] = [],
+        order_by: List[Tuple[str, str]] = [],
+        limit: Optional[int] = None,
+        offset: int = 0,
+        logger: Logger = None,
+        batch_size: int = 1000
+
+    ) -> Iterator[Tuple]:
+    """
+    fetch_many() as a generator: rows are read from SQLite batch_size at a time,
+    so only one batch is held in memory.
+    """
+
+
+    logger = logger or _DEFAULT_LOGGER
+
+    if offset and not order_by:
+        # without an order the skipped rows are arbitrary (and still read)
+        raise ValueError("fetch_many: offset requires order_by")
+    
+    def build_where_shape(where: List[Tuple[str, str, str]]) -> Tuple[Tuple, List]:
+        # values are bound as parameters, only ::TYPE casts and NULL stay in the SQL text
+        shape = []
+        params = []
+        for column, operator, value in where:
+            if operator.upper() == "IN":
+                # one placeholder per value, a single value is an IN list of one
+                values = value if isinstance(value, (list, tuple)) else [value]
+                inline = []
+                for v in values:
+                    if isinstance(v, str) and "::" in v:
+                        inline.append(v)
+                    else:
+                        inline.append(None)
+                        params.append(v)
+                shape.append((column, "IN", tuple(inline)))
+            elif isinstance(value, str) and ("::" in value or value.upper() == "NULL"):
+                shape.append((column, operator, value))
+            else:
+                shape.append((column, operator, None))
+                params.append(value)
+        return tuple(shape), params
+
+
+    try:
+        with _connection(db, readonly=True) as connection:
+            cursor = connection.cursor()
+
+            where_shape, params = build_where_shape(where)
+
+            # LIMIT only when asked for, OFFSET needs a LIMIT clause (-1: no limit)
+            has_limit = limit is not None or bool(offset)
+            if has_limit:
+                params += [-1 if limit is None else limit, offset]
+
+            query = _build_select(table, tuple(columns_list), where_shape,
+                                  tuple(map(tuple, order_by)), has_limit)
+            logger.info(f"FETCH MANY QUERY: {query} PARAMS: {params}")
+            cursor.arraysize = batch_size
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield from rows
+    
+    except Exception as error:
+        logger.log_exception(error, context="fetching rows")
+        raise error
+
+
 def fetch_many(
         db: str,
         table: str,
         columns_list: List[str],
         where: List[Tuple[str, str, str]] = [],
         order_by: List[Tuple[str, str]] = [],
-        limit: int = 999_999_999,
+        limit: Optional[int] = None,
         offset: int = 0,
         logger: Logger = None
 
@@ -224,63 +580,21 @@ def fetch_many(
                     ('name', 'LIKE', '%Ali%')
                 ]
 
-        limit (int, optional): Maximum number of rows to retrieve. Default is 999_999_999.
-        offset (int, optional): Number of rows to skip. Default is 0.
+        order_by (List[Tuple[str, str]], optional): ORDER BY columns, given as [(column, "ASC" | "DESC")].
+        limit (int, optional): Maximum number of rows to retrieve. Default is None (all rows).
+            order_by=[("id", "DESC")] with limit=1 lets SQLite read just the last index entry
+            instead of sorting the whole table.
+        offset (int, optional): Number of rows to skip, requires order_by. Default is 0.
         logger (Logger, optional): Custom logger instance for logging progress and errors.
-            If not provided, a default logger will be created using `get_logger("log", "db.log")`.
+            If not provided, the module's "db" logger is used.
 
     Returns:
         List[Tuple]: A list of rows retrieved, each row represented as a tuple.
+            Use iter_fetch_many() to stream large results instead of loading them at once.
     """
 
-
-    if logger is None:
-        logger = get_logger("db", "app.log")  # fallback if logger not provided
-    
-    def build_where_clause(where: List[Tuple[str, str, str]]) -> str:
-        clauses = []
-        for column, operator, value in where:
-            if "::" in value or value.upper() == "NULL":
-                clause = f"{column} {operator} {value}"
-            else:
-                clause = f"{column} {operator} '{value}'"
-            clauses.append(clause)
-        return "WHERE " + " AND ".join(clauses) if clauses else ""
-    
-    def build_order_by_clause(order_by: List[Tuple[str, str]]) -> str:
-        clauses = []
-        for column, operator in order_by:
-            clause = f"{column} {operator}"
-            clauses.append(clause)
-        return "ORDER BY " + " , ".join(clauses) if clauses else ""
-
-
-    try:
-        with sqlite3.connect(db) as connection:
-            cursor = connection.cursor()
-            
-            columns_text = ", ".join(columns_list)
-            where_clause_text = build_where_clause(where)
-            order_by_clause_text = build_order_by_clause(order_by)
-            query = f"""
-                SELECT {columns_text}
-                FROM {table}
-                {where_clause_text}
-                {order_by_clause_text}
-                LIMIT {limit}
-                OFFSET {offset};
-
-            """
-            logger.info(f"FETCH MANY QUERY: {query}")
-            cursor.execute(query)
-            return cursor.fetchall()
-    
-    except Exception as error:
-        logger.log_exception(error, context="fetching rows")
-        raise error
-    finally:
-        cursor.close()
-        connection.close()
+    return list(iter_fetch_many(db=db, table=table, columns_list=columns_list, where=where,
+                                order_by=order_by, limit=limit, offset=offset, logger=logger))
 
 
 def update_row(
@@ -303,67 +617,138 @@ def update_row(
         where (List[Tuple[str, str, Union[str, List[str]]]]): Filter conditions, given as [(column, operator, value)].
             Example: [("id", "IN", ["1", "2", "3"]), ("is_active", "=", "true::BOOLEAN")]
         logger (Logger, optional): Custom logger instance for logging progress and errors.
-            If not provided, a default logger will be created using `get_logger("log", "db.log")`.
+            If not provided, the module's "db" logger is used.
 
     Returns:
         None
     """
 
-    if logger is None:
-        logger = get_logger("db", "app.log")  # fallback if logger not provided
+    logger = logger or _DEFAULT_LOGGER
 
-    def format_value(val) -> str:
-        if isinstance(val, (int, float, bool)):
-            return str(val)  # quote YO‘Q
-        if isinstance(val, str):
-            return val if "::" in val else f"'{val}'"
-        return f"'{str(val)}'"
+    def format_value(val, params: List) -> Optional[str]:
+        # values are bound as parameters (no quoting / escaping needed), ::TYPE casts stay in the SQL text
+        if type(val) is str and "::" in val:
+            return val
+        params.append(val)
+        return None
 
 
-    def build_set_clause(pairs: List[Tuple[str, str]]) -> str:
-        return ", ".join([f"{col} = {format_value(val)}" for col, val in pairs])
+    def build_set_shape(pairs: List[Tuple[str, str]], params: List) -> Tuple:
+        return tuple([(col, format_value(val, params)) for col, val in pairs])
 
 
-    def build_where_clause(conditions: List[Tuple[str, str, Union[str, int, float, bool, List]]]) -> str:
-        clauses = []
+    def build_where_shape(conditions: List[Tuple[str, str, Union[str, int, float, bool, List]]], params: List) -> Tuple:
+        shape = []
         for column, operator, value in conditions:
             if operator.upper() == "IN":
-                if isinstance(value, list):
-                    formatted_values = ", ".join([format_value(v) for v in value])
+                if type(value) is list:
+                    if any(type(v) is str and "::" in v for v in value):
+                        inline = tuple([format_value(v, params) for v in value])
+                    else:
+                        # plain values: one placeholder each, no per value dispatch
+                        params.extend(value)
+                        inline = (None,) * len(value)
                 else:
-                    formatted_values = ", ".join([format_value(v.strip()) for v in str(value).split(",")])
-                clause = f"{column} IN ({formatted_values})"
+                    inline = tuple([format_value(v.strip(), params) for v in str(value).split(",")])
+                shape.append((column, "IN", inline))
             else:
-                clause = f"{column} {operator} {format_value(value)}"
-            clauses.append(clause)
-        return "WHERE " + " AND ".join(clauses) if clauses else ""
+                shape.append((column, operator, format_value(value, params)))
+        return tuple(shape)
 
 
     try:
-        with sqlite3.connect(db) as connection:
-            cursor = connection.cursor()
-
-            set_clause = build_set_clause(column_with_value)
-            where_clause = build_where_clause(where)
-
-            query = """
-                UPDATE %s
-                SET %s
-                %s;
-            """ % (table, set_clause, where_clause)
-            logger.info(f"📤 Updating...:\n {query}")
-            cursor.execute(query)
-            connection.commit()
+        with _connection(db) as connection:
+            params = []
+            set_shape = build_set_shape(column_with_value, params)
+            where_shape = build_where_shape(where, params)
+
+            query = _build_update(table, set_shape, where_shape)
+            logger.info(f"📤 Updating...:\n {query} PARAMS: {params}")
+            cursor = connection.execute(query, params)
             logger.info(f"✅ {cursor.rowcount} rows updated.")
 
         
     except Exception as error:
         logger.log_exception(error, context="updating rows")
         raise error
-    
-    finally:
-        cursor.close()
-        connection.close()
+
+
+def execute_sql(
+        db: str,
+        query: str,
+        params: Tuple = (),
+        logger: Logger = None
+
+    ) -> int:
+    """
+    Executes a single statement that the other helpers don't cover (indexes, migrations).
+
+    Args:
+        db (str): Path to the SQLite file.
+        query (str): SQL statement, values given as "?" placeholders.
+        params (Tuple, optional): Values bound to the placeholders.
+        logger (Logger, optional): Custom logger instance for logging progress and errors.
+
+    Returns:
+        int: Number of affected rows (-1 for statements that don't modify rows)
+    """
+
+    logger = logger or _DEFAULT_LOGGER
+
+    try:
+        with _connection(db) as connection:
+            cursor = connection.execute(query, params)
+        logger.info(f"✅DB: {db} | executed: {' '.join(query.split())}")
+        return cursor.rowcount
+
+    except Exception as error:
+        logger.log_exception(error, context="executing sql")
+        raise error
+
+
+def update_many(
+        db: str,
+        table: str,
+        set_columns: List[str],
+        where_columns: List[str],
+        data: List[Tuple],
+        logger: Logger = None
+
+    ) -> int:
+    """
+    Updates many rows with a single executemany in one transaction (one commit).
+
+    Args:
+        db (str): Path to the SQLite file.
+        table (str): Name of the table.
+        set_columns (List[str]): Columns to update, e.g. ["image_text", "text_extracted_status"]
+        where_columns (List[str]): Columns matched with "=" (joined with AND), e.g. ["image_url"]
+        data (List[Tuple]): One tuple per row: values of set_columns followed by values of where_columns.
+            Values are bound as parameters, no quoting / escaping is needed.
+        logger (Logger, optional): Custom logger instance for logging progress and errors.
+
+    Returns:
+        int: Number of updated rows
+    """
+
+    logger = logger or _DEFAULT_LOGGER
+
+    if not data:
+        return 0
+
+    set_clause = ", ".join([f"{column} = ?" for column in set_columns])
+    where_clause = " AND ".join([f"{column} = ?" for column in where_columns])
+    query = f"UPDATE {table} SET {set_clause} WHERE {where_clause};"
+
+    try:
+        with _connection(db) as connection:
+            cursor = connection.executemany(query, data)
+        logger.info(f"✅ {cursor.rowcount} rows updated in {table} ({len(data)} statements).")
+        return cursor.rowcount
+
+    except Exception as error:
+        logger.log_exception(error, context="updating rows in bulk")
+        raise error
 
 
 # TESTING fetch_many
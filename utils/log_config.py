@@ -1,4 +1,9 @@
 import logging
+import logging.handlers
+import atexit
+import functools
+import queue
+import threading
 import traceback
 import os, re
 from dotenv import load_dotenv
@@ -10,10 +15,15 @@ LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
 
+_NON_ASCII = re.compile(r'[^\x00-\x7F]+')
+
+
 class SafeUnicodeFilter(logging.Filter):
     def filter(self, record):
         # Faqat ascii (yoki xavfsiz unicode) belgilarini qoldiramiz
-        record.msg = self._remove_unsupported_chars(str(record.msg))
+        text = record.msg if isinstance(record.msg, str) else str(record.msg)
+        # Most records are plain ascii: nothing to check or strip
+        record.msg = text if text.isascii() else self._remove_unsupported_chars(text)
         return True
 
     def _remove_unsupported_chars(self, text):
@@ -22,7 +32,7 @@ class SafeUnicodeFilter(logging.Filter):
             return text
         except UnicodeEncodeError:
             # Yo Windows konsol kodirovka xatosi bo'lsa: emoji & unsupported belgilarni olib tashlaymiz
-            return re.sub(r'[^\x00-\x7F]+', '', text)  # faqat ascii qoldiradi
+            return _NON_ASCII.sub('', text)  # faqat ascii qoldiradi
 
 
 class CustomLogger(logging.Logger):
@@ -50,14 +60,17 @@ class UppercaseFilter(logging.Filter):
         return True
     
 
-def get_logger(name: str, log_file: str, level=logging.DEBUG):
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
+# log_file -> (queue, QueueListener): records are written by one background thread per file
+_listeners = {}
+_listeners_lock = threading.Lock()
 
-    # Oldini olish: logger har chaqirilganda 2-3 marta handler ulanmasligi
-    if logger.hasHandlers():
-        return logger
+# Set in forked children (OCR worker pool): they write directly, a listener thread
+# wouldn't get to flush before the worker process exits
+_direct_handlers = False
 
+
+def _start_listener(log_file: str, level=logging.DEBUG):
+    """File (+ dev console) handlers of log_file, fed by a queue from a listener thread"""
     # Formatter
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
@@ -69,8 +82,7 @@ def get_logger(name: str, log_file: str, level=logging.DEBUG):
     file_handler.addFilter(SafeUnicodeFilter())
     file_handler.addFilter(UppercaseFilter())
     file_handler.stream.reconfigure(encoding='utf-8')
-    
-    logger.addHandler(file_handler)
+    handlers = [file_handler]
 
     # Dev rejimida konsolga ham chiqaramiz
     if ENV != "prod":
@@ -79,8 +91,72 @@ def get_logger(name: str, log_file: str, level=logging.DEBUG):
         console_handler.setFormatter(formatter)
         console_handler.addFilter(SafeUnicodeFilter())
         console_handler.addFilter(UppercaseFilter())
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    if not _direct_handlers:
+        listener.start()
+    return log_queue, listener
+
+
+def _get_listener(log_file: str):
+    with _listeners_lock:
+        if log_file not in _listeners:
+            _listeners[log_file] = _start_listener(log_file)
+        return _listeners[log_file]
+
+
+@atexit.register
+def _stop_listeners():
+    """Write out the queued records before exit"""
+    if _direct_handlers:
+        return
+    for _, listener in list(_listeners.values()):
+        listener.stop()
+
+
+def _use_direct_handlers_in_child():
+    # listener threads don't survive fork: the child's loggers get the real handlers instead
+    global _listeners_lock, _direct_handlers
+    _listeners_lock = threading.Lock()
+    _direct_handlers = True
+
+    handlers_by_queue = {id(log_queue): listener.handlers for log_queue, listener in _listeners.values()}
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        for handler in list(getattr(logger, "handlers", ())):
+            if isinstance(handler, logging.handlers.QueueHandler) and id(handler.queue) in handlers_by_queue:
+                logger.removeHandler(handler)
+                for real_handler in handlers_by_queue[id(handler.queue)]:
+                    logger.addHandler(real_handler)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_use_direct_handlers_in_child)
+
+
+@functools.lru_cache(maxsize=None)
+def get_logger(name: str, log_file: str, level=logging.DEBUG):
+    """
+    Logger writing to logs/<log_file> (and the console in dev).
+    Cached: repeated calls with the same arguments return the configured logger directly.
+
+    The logger only puts records on a queue (QueueHandler), formatting, filtering
+    and the file / console writes happen in the listener thread of log_file.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+
+    # Oldini olish: logger har chaqirilganda 2-3 marta handler ulanmasligi
+    if logger.hasHandlers():
+        return logger
 
+    log_queue, listener = _get_listener(log_file)
+    if _direct_handlers:
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+    else:
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
     logger.propagate = False
     return logger
@@ -1,211 +1,461 @@
-from urllib.parse import urlparse
-import requests
-import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import os
+import time
 from integrations.google_drive import upload_image_if_not_exists
 import sys
 import random
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.log_config import get_logger
-from utils.db_utils import insert_many, update_row
+from utils.db_utils import insert_many, update_many, iter_fetch_many
 from utils.constants import (DB_NAME, 
                              TABLE_PRODUCT_IMAGES, 
                              LOCAL_IMAGES_FOLDER, 
                              LOCAL_OUTPUT_FOLDER,
                              OXYLABS_USERNAME,
                              OXYLABS_PASSWORD,
-                             OXYLABS_ENDPOINT
-
+                             OXYLABS_ENDPOINT,
+                             DOWNLOAD_CONCURRENCY,
+                             DOWNLOAD_RATE,
+                             DOWNLOAD_BURST,
+                             UPLOAD_WORKERS,
+                             DOWNLOAD_USE_PROXY
                             )
 
 logger = get_logger("image download", "app.log")
 
+IMAGES_PATH = f"{LOCAL_OUTPUT_FOLDER}/{LOCAL_IMAGES_FOLDER}"
+
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Referer": "https://www.1688.com/"
+}
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=10.0)  # 10s connect, 30s read
+# Oxylabs residential proxy (China exit), used when DOWNLOAD_USE_PROXY is set
+PROXY_URL = 'http://customer-%s-cc-CN:%s@%s' % (OXYLABS_USERNAME, OXYLABS_PASSWORD, OXYLABS_ENDPOINT)
+# Connection pool of the shared client: idle connections to the CDN are kept alive and reused,
+# failed connection attempts are retried by the transport (HTTP errors are retried per image)
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=30)
+HTTP_CONNECT_RETRIES = 3
+STREAM_CHUNK_SIZE = 1 << 16  # 64 KiB per read from the response body
+FILE_WRITE_BUFFER = 1 << 16  # writes reach the disk in 64 KiB blocks instead of 8 KiB ones
+DB_FLUSH_EVERY = 50  # finished images written to the db with one executemany (one commit)
+UPLOAD_QUEUE_SIZE = 32  # downloaded images waiting for an uploader, downloads pause when it is full
+
+
+class TokenBucket:
+    """
+    Request pacing shared by all downloads: acquire() waits for a token, tokens refill at
+    `rate` per second up to `burst`. Only the aggregate request rate is bounded, a request
+    doesn't wait when tokens are left.
+
+    Adaptive: slow_down() (429 / 403 responses) halves the rate, it is doubled back towards
+    the configured rate after every `restore_after` successful downloads.
+    """
+
+    def __init__(self, rate, burst, restore_after=20):
+        self.max_rate = self.rate = rate
+        self.burst = burst
+        self.restore_after = restore_after
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._successes = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def slow_down(self):
+        self._refill()
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+        self._successes = 0
+        logger.warning(f"Download rate lowered to {self.rate:.2f} req/s")
+
+    def success(self):
+        if self.rate >= self.max_rate:
+            return
+        self._successes += 1
+        if self._successes >= self.restore_after:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate * 2)
+            self._successes = 0
+            logger.info(f"Download rate raised to {self.rate:.2f} req/s")
+
+
+def new_client():
+    """httpx.AsyncClient shared by all downloads of a download_images() call"""
+    return httpx.AsyncClient(
+        headers=HTTP_HEADERS,
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        transport=httpx.AsyncHTTPTransport(retries=HTTP_CONNECT_RETRIES, limits=HTTP_LIMITS,
+                                           proxy=PROXY_URL if DOWNLOAD_USE_PROXY else None)
+    )
+
 
 def decode_filename(image_url):
-    
-    parsed = urlparse(image_url)
-    image_name = os.path.basename(parsed.path)
+    """Local file name of an image: last path segment of the url (no query / fragment), "!!" and "-" as "_" """
+    path = image_url.split("#", 1)[0].split("?", 1)[0]
+    image_name = path[path.rfind("/") + 1:]
     image_name = image_name.replace("!!", "_").replace("-","_")
 
     return image_name
 
 
-def download_file(img_url, base_file_path, gd_product_images_folder_id):
+def _upload(file_path, gd_product_images_folder_id):
+    """Upload a saved image to Google Drive (blocking, runs in a worker thread): (success, gd_img_url)"""
+    # Handle potential Google Drive upload failures
+    try:
+        gd_image_id = upload_image_if_not_exists(
+            gd_product_images_folder_id=gd_product_images_folder_id,
+            local_image_path=file_path
+        )
+        return True, gd_image_id
+    except Exception as e:
+        logger.error(f"Failed to upload to Google Drive: {str(e)}")
+        # marked as downloaded but failed upload
+        return False, "upload_failed"
+
+
+def _write_updates(rows):
+    """
+    Write (downloaded_status, image_filename, gd_img_url, etag, last_modified, image_url,
+    gd_product_images_folder_id) rows in one transaction
+    """
+    update_many(
+        db=DB_NAME,
+        table=TABLE_PRODUCT_IMAGES,
+        set_columns=["downloaded_status", "image_filename", "gd_img_url", "etag", "last_modified"],
+        where_columns=["image_url", "gd_product_images_folder_id"],
+        data=rows
+    )
+
+
+def flush_updates(pending):
+    """Write the collected rows (see _write_updates) and clear pending"""
+    if not pending:
+        return
+    rows = pending[:]
+    pending.clear()
+    _write_updates(rows)
+
+
+async def flush_updates_async(pending):
+    """flush_updates in a worker thread, downloads and uploads keep running during the db write"""
+    if not pending:
+        return
+    rows = pending[:]
+    pending.clear()
+    try:
+        await asyncio.to_thread(_write_updates, rows)
+    except Exception:
+        pending.extend(rows)  # written by the next flush
+        raise
+
+
+async def download_file(client, rate_limiter, upload_queue, img_url, base_file_path, gd_product_images_folder_ids,
+                        validators=(None, None)):
     """
     Download an image from a URL and upload it to Google Drive.
     
     Args:
+        client (httpx.AsyncClient): Shared client (keep-alive connections are reused across images)
+        rate_limiter (TokenBucket): Shared pacing, a token is taken before the request
+        upload_queue (asyncio.Queue): Saved images are handed to the uploaders through it
         img_url (str): URL of the image to download
-        base_file_path (str): Local directory to save the image
-        gd_images_folder_id (str): Google Drive folder ID for images
+        base_file_path (str): Local directory to save the image (must exist, see download_images_async)
+        gd_product_images_folder_ids (list): Google Drive folder IDs of the products using the image,
+            the saved image is uploaded to each of them
+        validators (tuple): (etag, last_modified) of an earlier download of the image. If its file
+            is still on disk they make the request conditional, a 304 reuses the file.
         
     Returns:
-        bool: True if download was successful, False otherwise
+        tuple: (success, rows), success is True if download was successful. rows are the
+            (downloaded_status, image_filename, gd_img_url, etag, last_modified, image_url,
+            gd_product_images_folder_id) db updates for the image or None, rows are written in
+            batches by download_images_async. A saved image has no rows yet, its uploaders record them.
     """
     if not img_url:
         logger.error("Empty image URL provided")
-        return False
+        return False, None
 
     try:
+        img_filename = decode_filename(img_url)
+        file_path = f"{base_file_path}/{img_filename}"
 
-        # Will be used if needed
-        
-        # entry = ('http://customer-%s-cc-CN:%s@%s' %
-        #         (OXYLABS_USERNAME, OXYLABS_PASSWORD, OXYLABS_ENDPOINT))
+        etag, last_modified = validators
+        headers = {}
+        if (etag or last_modified) and os.path.exists(file_path):
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
 
-        # proxies = {
-        #     "http": entry,
-        #     "https": entry
-        # }
-        
-        # Fallback to no proxy if needed
-        proxies = {}
-
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-            "Referer": "https://www.1688.com/"
-        }
-        
-        session = requests.Session()
-        session.proxies = proxies
-        session.headers.update(headers)
-        
-        # Add timeout to prevent hanging
-        response = session.get(img_url, timeout=(10, 30))  # 10s connect, 30s read
-        
-        if "rgv587_flag" in response.text:
-            logger.warning("CAPTCHA detected or waiting required!")
-            time.sleep(random.uniform(5, 15))  # Random sleep on CAPTCHA
-            return False
+        # The body is streamed: only its first chunk is checked for the CAPTCHA marker
+        # and an image goes to disk chunk by chunk instead of being held in memory
+        await rate_limiter.acquire()
+        async with client.stream("GET", img_url, headers=headers) as response:
+            chunks = response.aiter_bytes(STREAM_CHUNK_SIZE)
+            head = await anext(chunks, b"")
+            captcha = b"rgv587_flag" in head
 
-        img_filename = decode_filename(img_url)
-        img_filename = img_filename.replace("!!", "_").replace("-", "_")
-        
-        if response.status_code == 200:
-            # Ensure the directory exists
-            os.makedirs(base_file_path, exist_ok=True)
-            
-            file_path = f"{base_file_path}/{img_filename}"
-            with open(file_path, "wb") as f:
-                f.write(response.content)
+            if response.status_code == 200 and not captcha:
+                # written next to the final name and renamed once complete: an interrupted
+                # download never leaves a truncated image under file_path
+                part_path = f"{file_path}.part"
+                try:
+                    with open(part_path, "wb", buffering=FILE_WRITE_BUFFER) as f:
+                        f.write(head)
+                        async for chunk in chunks:
+                            f.write(chunk)
+                    os.replace(part_path, file_path)
+                finally:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
                 logger.info(f"✅ File saved: {img_filename}. URL: {img_url}")
-            
-            # Handle potential Google Drive upload failures
-            try:
-                gd_image_id = upload_image_if_not_exists(
-                    gd_product_images_folder_id=gd_product_images_folder_id,
-                    local_image_path=file_path
-                )
-                
-                update_row(
-                    db=DB_NAME,
-                    table=TABLE_PRODUCT_IMAGES,
-                    column_with_value=[
-                        ("downloaded_status", "1"),
-                        ("image_filename", img_filename),
-                        ("gd_img_url", gd_image_id),
-                    ],
-                    where=[("image_url","=",img_url)]
-                )
-                return True
-            except Exception as e:
-                logger.error(f"Failed to upload to Google Drive: {str(e)}")
-                # Update DB to mark as downloaded but failed upload
-                update_row(
-                    db=DB_NAME,
-                    table=TABLE_PRODUCT_IMAGES,
-                    column_with_value=[
-                        ("downloaded_status", "1"),
-                        ("image_filename", img_filename),
-                        ("gd_img_url", "upload_failed"),
-                    ],
-                    where=[("image_url","=",img_url)]
-                )
-                return False
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+        if captcha:
+            logger.warning("CAPTCHA detected or waiting required!")
+            await asyncio.sleep(random.uniform(5, 15))  # Random sleep on CAPTCHA
+            return False, None
+
+        if response.status_code in (200, 304):
+            rate_limiter.success()
+            if response.status_code == 304:
+                logger.info(f"✅ File unchanged, reusing {img_filename}. URL: {img_url}")
+            # the uploads run in the upload stage, this download slot goes to the next image
+            for gd_product_images_folder_id in gd_product_images_folder_ids:
+                await upload_queue.put((img_url, img_filename, file_path, gd_product_images_folder_id,
+                                        etag, last_modified))
+            return True, None
                 
         elif response.status_code == 404:
-            update_row(
-                db=DB_NAME,
-                table=TABLE_PRODUCT_IMAGES,
-                column_with_value=[
-                    ("downloaded_status", "1"),
-                    ("image_filename", img_filename),
-                    ("gd_img_url", "404"),
-                ],
-                where=[("image_url","=",img_url)]
-            )
-            return True
+            return True, [("1", img_filename, "404", None, None, img_url, gd_product_images_folder_id)
+                          for gd_product_images_folder_id in gd_product_images_folder_ids]
         elif response.status_code in (429, 403):
             logger.warning(f"Rate limited or access denied: {response.status_code}")
-            time.sleep(random.uniform(10, 20))  # Back off on rate limiting
-            return False
+            rate_limiter.slow_down()  # Back off on rate limiting (the retry waits as well)
+            return False, None
         else:
-            logger.error(f"❌ File not downloaded: {img_url}, Response Code: {response.status_code}, Response: {str(response.content)[:200]}")
-            return False
+            logger.error(f"❌ File not downloaded: {img_url}, Response Code: {response.status_code}, Response: {str(head)[:200]}")
+            return False, None
             
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logger.error(f"Timeout while downloading image: {img_url}")
-        return False
-    except requests.exceptions.ConnectionError:
+        return False, None
+    except httpx.TransportError:
         logger.error(f"Connection error while downloading image: {img_url}")
-        return False
+        return False, None
     except Exception as e:
         logger.error(f"Unexpected error while downloading image {img_url}: {str(e)}")
-        return False
+        return False, None
 
-def download_images(image_details_to_downlaod, max_retries=3):
+async def _uploader(upload_queue, upload_executor, pending, results):
     """
-    Download multiple images with retry logic.
-    
-    Args:
-        image_urls_list (list): List of image URLs to download
-        gd_images_folder_id (str): Google Drive folder ID for images
-        max_retries (int): Maximum number of retry attempts for failed downloads
-        
-    Returns:
-        dict: Dictionary of results with URLs as keys and success status as values
+    Upload stage: takes saved images off the queue until a None sentinel and uploads them
+    in the upload threads, so uploads overlap with the downloads still running.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await upload_queue.get()
+        if item is None:
+            return
+        img_url, img_filename, file_path, gd_product_images_folder_id, etag, last_modified = item
+
+        # Errors are handled per image: an uploader that dies stops draining the
+        # bounded queue and the downloads waiting on upload_queue.put() never finish
+        try:
+            # Drive upload is blocking, it runs in an upload thread
+            success, gd_image_id = await loop.run_in_executor(
+                upload_executor, _upload, file_path, gd_product_images_folder_id)
+        except Exception as e:
+            logger.log_exception(e, f"uploading {img_filename}")
+            success, gd_image_id = False, "upload_failed"
+        if not success:
+            results[img_url] = False
+
+        pending.append(("1", img_filename, gd_image_id, etag, last_modified, img_url, gd_product_images_folder_id))
+        if len(pending) >= DB_FLUSH_EVERY:
+            try:
+                await flush_updates_async(pending)
+            except Exception as e:
+                # the rows stay pending, the final flush writes them
+                logger.log_exception(e, "writing downloaded images to db")
+
+
+async def _download_with_retries(client, rate_limiter, upload_queue, semaphore, pending, img_url,
+                                 gd_product_images_folder_ids, validators, max_retries):
+    """
+    Download one image, retrying with backoff. At most DOWNLOAD_CONCURRENCY images are in flight.
+    Its db rows are added to pending, which is flushed every DB_FLUSH_EVERY rows (off the event loop).
+    """
+    logger.debug(f"Product images folder ids: {gd_product_images_folder_ids}")
+
+    # Implement retry logic
+    success = False
+    attempts = 0
+
+    while not success and attempts < max_retries:
+        attempts += 1
+
+        # Exponential backoff if retrying (outside the semaphore, the slot goes to another image)
+        if attempts > 1:
+            backoff_time = random.uniform(5, 15) * (attempts - 1)
+            logger.info(f"Retry attempt {attempts} for {img_url}, waiting {backoff_time:.2f}s")
+            await asyncio.sleep(backoff_time)
+
+        async with semaphore:
+            # Download the image (paced by the shared token bucket)
+            success, rows = await download_file(
+                client=client,
+                rate_limiter=rate_limiter,
+                upload_queue=upload_queue,
+                img_url=img_url,
+                base_file_path=IMAGES_PATH,
+                gd_product_images_folder_ids=gd_product_images_folder_ids,
+                validators=validators
+            )
+
+        if rows is not None:
+            pending.extend(rows)
+            if len(pending) >= DB_FLUSH_EVERY:
+                try:
+                    await flush_updates_async(pending)
+                except Exception as e:
+                    # the rows stay pending, the final flush writes them
+                    logger.log_exception(e, "writing downloaded images to db")
+
+    if not success:
+        logger.warning(f"Failed to download {img_url} after {max_retries} attempts")
+    return success
+
+
+async def _queue_uploads(upload_queue, items):
+    """Hand images already on disk straight to the uploaders"""
+    for item in items:
+        await upload_queue.put(item)
+
+
+async def download_images_async(image_details_to_downlaod, max_retries=3, concurrency=DOWNLOAD_CONCURRENCY):
+    """
+    download_images() coroutine, two stages connected by a bounded queue: downloads run
+    concurrently over one shared client, UPLOAD_WORKERS uploaders push the saved images to Drive.
     """
     results = {}
-    
-    # coming img_urls_list as list of tuples like [(img_url), ]
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limiter = TokenBucket(rate=DOWNLOAD_RATE, burst=DOWNLOAD_BURST)
+
+    # Ensure the directory exists (once, not per image)
+    os.makedirs(IMAGES_PATH, exist_ok=True)
+
+    # Images already downloaded (e.g. for another product): url -> (image_filename, gd_img_url, etag, last_modified).
+    # Their file is reused, it only has to be uploaded into the folders of the remaining products.
+    downloaded = {row[0]: row[1:] for row in iter_fetch_many(
+        db=DB_NAME,
+        table=TABLE_PRODUCT_IMAGES,
+        columns_list=["image_url", "image_filename", "gd_img_url", "etag", "last_modified"],
+        where=[("downloaded_status", "=", "1")],
+        logger=logger
+    )}
+    # (etag, last_modified) kept from an earlier download of images waiting to be downloaded again
+    validators = {img_url: (etag, last_modified) for img_url, etag, last_modified in iter_fetch_many(
+        db=DB_NAME,
+        table=TABLE_PRODUCT_IMAGES,
+        columns_list=["image_url", "etag", "last_modified"],
+        where=[("downloaded_status", "=", "0")],
+        logger=logger
+    ) if etag or last_modified}
+
+    # coming img_urls_list as list of tuples like [(img_url, gd_product_images_folder_id), ]
+    pending = []
+    folders_by_url = {}   # image to download -> product folders it is uploaded to
+    saved_uploads = []    # upload queue items of images already on disk
+    seen = set()
     for img_url, gd_product_images_folder_id in image_details_to_downlaod:
-        print("PRODUCT IMAGES FOLDER ID: ", gd_product_images_folder_id)
-        
         # Skip empty URLs
         if not img_url:
             logger.warning("Empty image URL found, skipping")
             continue
-        
-        # Implement retry logic
-        success = False
-        attempts = 0
-        
-        while not success and attempts < max_retries:
-            attempts += 1
-            
-            # Exponential backoff if retrying
-            if attempts > 1:
-                backoff_time = random.uniform(5, 15) * (attempts - 1)
-                logger.info(f"Retry attempt {attempts} for {img_url}, waiting {backoff_time:.2f}s")
-                time.sleep(backoff_time)
-            
-            # Randomized sleep between requests
-            sleep_time = random.uniform(1, 5)
-            logger.info(f"Sleep time between downloads: {sleep_time:.2f}s")
-            time.sleep(sleep_time)
-            
-            # Download the image
-            success = download_file(
-                img_url=img_url, 
-                base_file_path=f"{LOCAL_OUTPUT_FOLDER}/{LOCAL_IMAGES_FOLDER}", 
-                gd_product_images_folder_id=gd_product_images_folder_id
+        # one row per product and image: every product folder gets its own upload
+        if (img_url, gd_product_images_folder_id) in seen:
+            continue
+        seen.add((img_url, gd_product_images_folder_id))
+
+        if img_url in downloaded:
+            img_filename, gd_img_url, etag, last_modified = downloaded[img_url]
+            if gd_img_url == "404":
+                pending.append(("1", img_filename, "404", None, None, img_url, gd_product_images_folder_id))
+                results[img_url] = True
+                continue
+
+            file_path = f"{IMAGES_PATH}/{img_filename}"
+            if img_filename and os.path.exists(file_path):
+                saved_uploads.append((img_url, img_filename, file_path, gd_product_images_folder_id,
+                                      etag, last_modified))
+                continue
+        folders_by_url.setdefault(img_url, []).append(gd_product_images_folder_id)
+
+    if saved_uploads:
+        logger.info(f"{len(saved_uploads)} images already downloaded, {len(folders_by_url)} to download")
+
+    upload_queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_SIZE)
+    # uploads get their own threads (UPLOAD_WORKERS at most) instead of the loop's default executor
+    upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="gd-upload")
+    uploaders = [asyncio.create_task(_uploader(upload_queue, upload_executor, pending, results))
+                 for _ in range(UPLOAD_WORKERS)]
+    try:
+        async with new_client() as client:
+            _, *successes = await asyncio.gather(
+                _queue_uploads(upload_queue, saved_uploads),
+                *[_download_with_retries(client, rate_limiter, upload_queue, semaphore, pending, img_url,
+                                         gd_product_images_folder_ids, validators.get(img_url, (None, None)),
+                                         max_retries)
+                  for img_url, gd_product_images_folder_ids in folders_by_url.items()]
             )
-        
-        results[img_url] = success
-        
-        if not success:
-            logger.warning(f"Failed to download {img_url} after {max_retries} attempts")
-    
+        # downloads are done: one sentinel per uploader, they stop once the queue is drained
+        for _ in uploaders:
+            await upload_queue.put(None)
+        await asyncio.gather(*uploaders)
+    finally:
+        for uploader in uploaders:
+            uploader.cancel()
+        upload_executor.shutdown(wait=True)
+        flush_updates(pending)
+
+    # failed uploads are already recorded as False
+    for img_url, success in zip(folders_by_url, successes):
+        results.setdefault(img_url, success)
+    for img_url, *_ in saved_uploads:
+        results.setdefault(img_url, True)
     return results
+
+
+def download_images(image_details_to_downlaod, max_retries=3):
+    """
+    Download multiple images concurrently (up to DOWNLOAD_CONCURRENCY at a time, DOWNLOAD_RATE
+    requests per second) with retry logic.
+    
+    Args:
+        image_details_to_downlaod (list): List of (image_url, gd_product_images_folder_id) tuples
+        max_retries (int): Maximum number of retry attempts for failed downloads
+        
+    Returns:
+        dict: Dictionary of results with URLs as keys and success status as values
+    """
+    return asyncio.run(download_images_async(image_details_to_downlaod, max_retries=max_retries))
@@ -1,90 +1,191 @@
-import bs4, re, json
-
-def get_left_gallery_image(outer_dom):
-    img_link_list = []
-    if outer_dom:
-        left_gallery = outer_dom.find("div", class_="detail-gallery-turn")
-        left_gallery_images = left_gallery.find_all("div", class_="detail-gallery-turn-wrapper")
-        for lg_image in left_gallery_images:
-            if lg_image.get("class") == ["detail-gallery-turn-wrapper"]:
-                dg_image_url = lg_image.find("img", class_="detail-gallery-img")
-                img_link_list.append(dg_image_url["src"])
-                # print("URL", dg_image_url)
-    
-    return img_link_list
-
-
-def get_offer_attrs(outer_dom):
-    ofattrs = {}
-
-    offer_attrs_dom = outer_dom.find("div", class_="offer-attr-list")
-    offer_attrs = offer_attrs_dom.find_all("div", class_="offer-attr-item")
-    for ofat in offer_attrs:
-        ofat_name = ofat.find("span", class_="offer-attr-item-name")
-        ofat_value = ofat.find("span", class_="offer-attr-item-value")
-
-        ofat_name_text = ofat_name.text.strip()
-        ofat_value_text = ofat_value.text.strip()
-        if ofat_name_text:
-            ofattrs[ofat_name_text] = ofat_value_text
-        # print(f"{ofat_name.text.strip()} - {ofat_value.text.strip()}")
-
-    return ofattrs
-
-
-def get_details(outer_dom):
-
-    text_details = []
-    img_details = []
-
-    all_details_dom = outer_dom.find("div", class_="content-detail")
-
-    all_details = all_details_dom.find_all("p") if all_details_dom else None
-    if all_details:
-        for detail in all_details:
-            detail_img = detail.find("img")
-            if detail_img:                
-                detail_img_url = detail_img["data-lazyload-src"] if detail_img else None
-                img_details.append(detail_img_url)  if "?" in detail_img_url else None
-                # print(detail_img_url)
-            
-            text_detail = detail.text.strip()
+from collections import Counter
+
+from lxml import etree
+
+
+# Only these tags can carry data we collect, everything else is just pushed on the stack
+_TRACKED_TAGS = frozenset(("title", "div", "span", "p", "img"))
+
+
+class _Paragraph:
+    """Text and first image of a <p> inside the content detail block"""
+
+    def __init__(self):
+        self.text_parts = []
+        self.img_seen = False
+        self.img_url = None
+
+
+class ProductTarget:
+    """
+    lxml parser target that collects product data in a single streaming pass.
+
+    No DOM is built: only the elements we need are tracked with a small stack
+    of open elements, so memory stays flat on multi-megabyte product pages.
+
+    Collected (only the first block of each kind counts):
+        - <title> text
+        - div.detail-gallery-turn > div.detail-gallery-turn-wrapper > first img.detail-gallery-img @src
+        - div.offer-attr-list > div.offer-attr-item > first span.offer-attr-item-name / -value text
+        - div.content-detail > p text and first img @data-lazyload-src (only urls with "?")
+        - div.content-detail img.desc-img-no-load @data-lazyload-src
+    """
+
+    def __init__(self):
+        self._stack = []          # (tag, role, payload) of every open element
+        self._open = Counter()    # number of open elements per role
+        self._done = set()        # roles whose first block is already closed
+
+        self._title_parts = []
+        self._wrappers = []       # open gallery wrappers: [img_found]
+        self._attr_item = None
+        self._attr_field = None
+        self._paragraphs = []
+        self._open_paragraphs = []
+
+        self.gallery_images = []
+        self.offer_attrs = {}
+        self.desc_images = []
+
+    def _first_block(self, role):
+        return role not in self._done and not self._open[role]
+
+    def start(self, tag, attrib):
+        if tag not in _TRACKED_TAGS:
+            self._stack.append((tag, None, None))
+            return
+
+        class_attr = attrib.get("class")
+        classes = class_attr.split() if class_attr else ()
+        role = None
+        payload = None
+
+        if tag == "title" and self._first_block("title"):
+            role = "title"
+
+        elif tag == "div":
+            if "detail-gallery-turn" in classes and self._first_block("gallery"):
+                role = "gallery"
+            elif self._open["gallery"] and class_attr and class_attr.strip() == "detail-gallery-turn-wrapper":
+                role = "wrapper"
+                payload = [False]
+                self._wrappers.append(payload)
+            elif "offer-attr-list" in classes and self._first_block("attr_list"):
+                role = "attr_list"
+            elif self._open["attr_list"] and not self._open["attr_item"] and "offer-attr-item" in classes:
+                role = "attr_item"
+                self._attr_item = {"name": None, "value": None}
+            elif "content-detail" in classes and self._first_block("content"):
+                role = "content"
+
+        elif tag == "span" and self._attr_item is not None and self._attr_field is None:
+            for field in ("name", "value"):
+                if f"offer-attr-item-{field}" in classes and self._attr_item[field] is None:
+                    role = "attr_field"
+                    self._attr_item[field] = self._attr_field = []
+                    break
+
+        elif tag == "p" and self._open["content"]:
+            role = "p"
+            payload = _Paragraph()
+            self._paragraphs.append(payload)
+            self._open_paragraphs.append(payload)
+
+        elif tag == "img":
+            if "detail-gallery-img" in classes:
+                for wrapper in self._wrappers:
+                    if not wrapper[0]:
+                        wrapper[0] = True
+                        if "src" in attrib:
+                            self.gallery_images.append(attrib["src"])
+
+            if self._open["content"]:
+                img_url = attrib.get("data-lazyload-src")
+                for paragraph in self._open_paragraphs:
+                    if not paragraph.img_seen:
+                        paragraph.img_seen = True
+                        if img_url and "?" in img_url:
+                            paragraph.img_url = img_url
+                if img_url is not None and "desc-img-no-load" in classes:
+                    self.desc_images.append(img_url)
+
+        self._stack.append((tag, role, payload))
+        if role:
+            self._open[role] += 1
+
+    def _pop(self):
+        tag, role, payload = self._stack.pop()
+        if not role:
+            return tag
+
+        self._open[role] -= 1
+        if role in ("title", "gallery", "attr_list", "content"):
+            self._done.add(role)
+        elif role == "wrapper":
+            self._wrappers.remove(payload)
+        elif role == "attr_field":
+            self._attr_field = None
+        elif role == "attr_item":
+            name = "".join(self._attr_item["name"] or []).strip()
+            if name:
+                self.offer_attrs[name] = "".join(self._attr_item["value"] or []).strip()
+            self._attr_item = None
+        elif role == "p":
+            self._open_paragraphs.remove(payload)
+        return tag
+
+    def end(self, tag):
+        stack = self._stack
+        if stack and stack[-1][0] == tag and stack[-1][1] is None:
+            # Common case: well-formed close of an untracked element
+            stack.pop()
+        elif any(open_tag == tag for open_tag, _, _ in stack):
+            # Pop up to the matching open element (tolerates unbalanced markup)
+            while self._pop() != tag:
+                pass
+
+    def data(self, text):
+        if self._open["title"]:
+            self._title_parts.append(text)
+        if self._attr_field is not None:
+            self._attr_field.append(text)
+        for paragraph in self._open_paragraphs:
+            paragraph.text_parts.append(text)
+
+    def close(self):
+        while self._stack:
+            self._pop()
+
+        text_details = []
+        img_details = []
+        for paragraph in self._paragraphs:
+            if paragraph.img_url:
+                img_details.append(paragraph.img_url)
+
+            text_detail = "".join(paragraph.text_parts).strip()
             if text_detail and len(text_detail) > 4:
                 text_detail = text_detail.replace("'", "")
                 text_details.append(text_detail)
-    
 
-    all_detail_images = all_details_dom.find_all("img", class_="desc-img-no-load") if all_details_dom else None
-    # print(all_detail_images)
-    if all_detail_images:
-        for detail_img in all_detail_images:
-            detail_img_url = detail_img["data-lazyload-src"] if detail_img else None
-            img_details.append(detail_img_url)
-        # print(detail.text)
-    
-    return text_details, img_details
+        img_details.extend(self.desc_images)
 
+        return {
+            "title_chn": "".join(self._title_parts).strip(),
+            "gallery_images": self.gallery_images,
+            "product_attributes_chn": self.offer_attrs,
+            "text_details_chn": text_details,
+            "img_details": img_details,
+        }
 
 
 def parser(html_text):
-    product_data = {}
-    soup = bs4.BeautifulSoup(html_text, 'lxml')
-    title = soup.find("title").text.strip()
-    # print(title)
-    # -- MAIN DOM --
-    main_dom = soup.find("div", id="root-container")
-
-    # -- Find left gallery images --
-    lg_images = get_left_gallery_image(outer_dom=main_dom)
-
-    offer_attrs = get_offer_attrs(outer_dom=main_dom)
-    
-    text_details, img_details = get_details(outer_dom=main_dom)
-
-    product_data["title_chn"] = title
-    product_data["gallery_images"] = lg_images
-    product_data["product_attributes_chn"] = offer_attrs
-    product_data["text_details_chn"] = text_details
-    product_data["img_details"] = img_details
-
-    return product_data
+    """
+    Parse a product page.
+
+    html_text can be str or UTF-8 bytes (what scrape() returns): bytes are handed
+    to libxml2 as they are, without a Python level decode. A new parser is built
+    per call since pages are parsed concurrently by the scraper threads.
+    """
+    html_parser = etree.HTMLParser(target=ProductTarget(), encoding="utf-8", huge_tree=True)
+    html_parser.feed(html_text)
+    return html_parser.close()
@@ -1,7 +1,7 @@
 import os
 
 from utils.log_config import get_logger
-from utils.db_utils import prepare_table
+from utils.db_utils import prepare_table, execute_sql, fetch_many, with_transaction
 
 import sys
 import os
@@ -18,54 +18,100 @@ logger = get_logger("db", "app.log")
 
 def main():
 
-    # creating product data table
-    prepare_table(
-            db=DB_NAME, 
-            table=TABLE_PRODUCT_DATA,
-            columns_dict={
-                "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
-                # main data columns
-                "product_url": "TEXT",
-                "title_chn": "TEXT",
-                "title_en": "TEXT",
-                "product_attributes_chn": "TEXT", # dumped json string
-                "product_attributes_en": "TEXT", # dumped json string
-                "text_details_chn": "TEXT", # dumped json string
-                "text_details_en": "TEXT", # dumped json string
+    # all tables and indexes are created in one transaction (a single commit),
+    # the helpers below join it instead of committing one by one
+    with with_transaction(DB_NAME):
+
+        # creating product data table
+        prepare_table(
+                db=DB_NAME, 
+                table=TABLE_PRODUCT_DATA,
+                columns_dict={
+                    "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+                    # main data columns
+                    "product_url": "TEXT",
+                    "title_chn": "TEXT",
+                    "title_en": "TEXT",
+                    "product_attributes_chn": "TEXT", # dumped json string
+                    "product_attributes_en": "TEXT", # dumped json string
+                    "text_details_chn": "TEXT", # dumped json string
+                    "text_details_en": "TEXT", # dumped json string
                 
-                # columns to check the process status
-                "notion_product_id": "TEXT",
-                "scraped_status": "BOOLEAN DEFAULT 0",
-                "gd_product_images_folder_id": "TEXT",
-                "translated_status": "BOOLEAN DEFAULT 0",
-                "gd_file_url": "TEXT",
-                "uploaded_to_gd_status": "BOOLEAN DEFAULT 0",
-                "updated_on_notion_status": "BOOLEAN DEFAULT 0",
-                "created_at": "DATETIME DEFAULT (datetime('now','localtime'))"
-            },
-            drop=False
-            )
-    
-    # creating product images table
-    prepare_table(db=DB_NAME, 
-              table= TABLE_PRODUCT_IMAGES, 
-              columns_dict={
-                  "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
-                  "image_url": "TEXT",
-                  "image_filename": "TEXT", 
-                  "image_text": "TEXT", # dumped list string
-                  "image_text_en": "TEXT", # dumped list string
-                  "downloaded_status": "BOOLEAN DEFAULT 0",
-                  "text_extracted_status": "BOOLEAN DEFAULT 0",
-                  "text_translated_status": "BOOLEAN DEFAULT 0",
-                  "product_url": "TEXT",
-                  "gd_img_url": "TEXT",
-                  "gd_product_images_folder_id": "TEXT",
-                  "created_at": "DATETIME DEFAULT (datetime('now','localtime'))"
-              },
-              drop=False
-              )
+                    # columns to check the process status
+                    "notion_product_id": "TEXT",
+                    "scraped_status": "BOOLEAN DEFAULT 0",
+                    "gd_product_images_folder_id": "TEXT",
+                    "translated_status": "BOOLEAN DEFAULT 0",
+                    "gd_file_url": "TEXT",
+                    "uploaded_to_gd_status": "BOOLEAN DEFAULT 0",
+                    "updated_on_notion_status": "BOOLEAN DEFAULT 0",
+                    "created_at": "DATETIME DEFAULT (datetime('now','localtime'))"
+                },
+                drop=False
+                )
     
+        # creating product images table
+        prepare_table(db=DB_NAME, 
+                  table= TABLE_PRODUCT_IMAGES, 
+                  columns_dict={
+                      "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+                      "image_url": "TEXT",
+                      "image_filename": "TEXT", 
+                      "image_text": "TEXT", # dumped list string
+                      "image_text_en": "TEXT", # dumped list string
+                      "downloaded_status": "BOOLEAN DEFAULT 0",
+                      "text_extracted_status": "BOOLEAN DEFAULT 0",
+                      "text_translated_status": "BOOLEAN DEFAULT 0",
+                      "product_url": "TEXT",
+                      "gd_img_url": "TEXT",
+                      "gd_product_images_folder_id": "TEXT",
+                      "etag": "TEXT", # validators of the last download, for conditional re-downloads
+                      "last_modified": "TEXT",
+                      "created_at": "DATETIME DEFAULT (datetime('now','localtime'))"
+                  },
+                  drop=False
+                  )
+
+        # one row per (product, image): an image shared by several products keeps a row for each of them,
+        # re-scraping a product inserts with OR IGNORE instead of duplicating its rows.
+        unique_index = f"ux_{TABLE_PRODUCT_IMAGES}_product_image"
+        if not fetch_many(
+                db=DB_NAME,
+                table="sqlite_master",
+                columns_list=["name"],
+                where=[("type", "=", "index"), ("name", "=", unique_index)],
+                logger=logger):
+            # one-off migration: rows duplicated by earlier runs are removed before
+            # the unique index is built (it can't be built over them)
+            execute_sql(
+                db=DB_NAME,
+                query=f"""
+                    DELETE FROM {TABLE_PRODUCT_IMAGES}
+                    WHERE id NOT IN (
+                        SELECT MIN(id) FROM {TABLE_PRODUCT_IMAGES} GROUP BY product_url, image_url
+                    );
+                """,
+                logger=logger
+            )
+            execute_sql(
+                db=DB_NAME,
+                query=f"CREATE UNIQUE INDEX {unique_index} ON {TABLE_PRODUCT_IMAGES} (product_url, image_url);",
+                logger=logger
+            )
+
+        # image rows are updated / looked up by image_url (the unique index above leads with product_url)
+        # and picked for downloading by downloaded_status
+        execute_sql(
+            db=DB_NAME,
+            query=f"CREATE INDEX IF NOT EXISTS idx_{TABLE_PRODUCT_IMAGES}_image_url ON {TABLE_PRODUCT_IMAGES} (image_url);",
+            logger=logger
+        )
+        execute_sql(
+            db=DB_NAME,
+            query=f"CREATE INDEX IF NOT EXISTS idx_{TABLE_PRODUCT_IMAGES}_downloaded_status ON {TABLE_PRODUCT_IMAGES} (downloaded_status);",
+            logger=logger
+        )
+
     os.makedirs(LOCAL_OUTPUT_FOLDER, exist_ok=True)
 
     images_output_folder = os.path.join(LOCAL_OUTPUT_FOLDER, LOCAL_IMAGES_FOLDER)
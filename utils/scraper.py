@@ -1,9 +1,13 @@
 import time
+import asyncio
+import contextlib
 import os, re, json
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import undetected_chromedriver as uc
+import httpx
 import subprocess
 from integrations.google_drive import upload_to_drive_and_get_link, get_or_create_folder, get_or_create_sub_subfolder
 from utils.parser import parser
@@ -11,10 +15,12 @@ from utils.parser import parser
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils.db_utils import update_row, insert_many, fetch_many
+from utils.db_utils import update_row, insert_many, fetch_many, with_transaction
 from utils.log_config import get_logger
 from utils.constants import (DB_NAME,
                              HEADLESS,
+                             SCRAPER_DRIVERS,
+                             SCRAPER_HTTP_FAST,
                               TABLE_PRODUCT_DATA, 
                               TABLE_PRODUCT_IMAGES, 
                               LOCAL_OUTPUT_FOLDER,
@@ -25,9 +31,29 @@ from utils.constants import (DB_NAME,
 from utils.utils import json_dumps
 logger = get_logger("scraper", "app.log")
 
+_OFFER_RE = re.compile(r'/offer/(\d+)')
+
+# Explicit waits return as soon as the element shows up (no fixed sleeps)
+PAGE_WAIT_TIMEOUT = 12
+PAGE_WAIT_POLL = 0.25
+
+HTML_WRITE_BUFFER = 1 << 17
+
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Referer": "https://www.1688.com/"
+}
+HTTP_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+
+# Session cookies kept between runs (1688 serves a captcha to sessions without history)
+COOKIES_FILE = f"{LOCAL_OUTPUT_FOLDER}/cookies.json"
+COOKIES_DOMAIN_URL = "https://detail.1688.com/"
+
 
 def extract_offer_id(url: str) -> str:
-    match = re.search(r'/offer/(\d+)', url)
+    match = _OFFER_RE.search(url)
     
     return match.group(1) if match else "unknown"
 
@@ -38,7 +64,15 @@ def get_chrome_major_version():
     return major_version
 
 
-def get_optimized_driver(headless=False):
+def get_optimized_driver(headless=HEADLESS, full_render=False):
+    """
+    Chrome driver tuned for reading the product DOM.
+
+    By default images and notifications are blocked and driver.get returns on
+    DOMContentLoaded (page_load_strategy "eager"): image urls are read from the
+    html attributes, the pixels are never needed. full_render=True keeps the
+    regular full page load with images.
+    """
 
     # chrome_version = get_chrome_major_version()
 
@@ -52,6 +86,15 @@ def get_optimized_driver(headless=False):
     if headless:
         options.add_argument('--headless=new')
 
+    if not full_render:
+        prefs = {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+        }
+        options.add_experimental_option("prefs", prefs)
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.page_load_strategy = "eager"
+
     # oxylab proxy
 
     # entry = ('http://customer-%s-cc-CN:%s@pr.oxylabs.io:7777' %
@@ -64,108 +107,288 @@ def get_optimized_driver(headless=False):
     return driver
 
 
-def scrape(driver, url):
+def _write_html(filename, html):
+    """Single write of the encoded page through a 128KB buffer"""
+    with open(filename, "wb", buffering=HTML_WRITE_BUFFER) as f:
+        f.write(html)
+
+
+def scrape(driver, url, debug_dump=False):
+    """
+    Load a product page.
+
+    Returns:
+        tuple: (status, html) - (200, page html as UTF-8 bytes), (404, None) when the
+            product was removed, (None, None) for a bad URL. The html is passed on in
+            memory, it's only written to output/current_page.html with debug_dump=True.
+    """
     
     driver.get(url)
-    time.sleep(2)
 
     # optional: waiting neccery DOM
     try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'title-text')]"))
+        WebDriverWait(driver, PAGE_WAIT_TIMEOUT, poll_frequency=PAGE_WAIT_POLL).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "div[class*='title-text']"))
         )
     except:
         logger.warning(f"Bad URL! No title-text found in {url}")
         try:
             driver.find_element("xpath", "//h3[contains(text(), '商品已下架')]")
             logger.warning("⚠️  Product removed from the site!")
-            return 404
+            return 404, None
         except:        
-            return None
+            return None, None
     try:
-        WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'content-detail')]"))
+        WebDriverWait(driver, PAGE_WAIT_TIMEOUT, poll_frequency=PAGE_WAIT_POLL).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "div[class*='content-detail']"))
             )
     except Exception as error:
         logger.warning("No content-details appeared!")
     
-    # html output filepath
-    filename = f"{LOCAL_OUTPUT_FOLDER}/current_page.html"
+    # bytes go straight to the lxml parser
+    html = driver.page_source.encode("utf-8")
 
-    html = driver.page_source
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
+    if debug_dump:
+        # html output filepath
+        filename = f"{LOCAL_OUTPUT_FOLDER}/current_page.html"
+        _write_html(filename, html)
 
-    logger.info(f"✅ Saved: {filename}")
+        logger.info(f"✅ Saved: {filename}")
 
-    return html
+    return 200, html
+
+
+async def try_http_fast(client, url):
+    """
+    Fetch a product page without a browser.
+
+    Returns the parsed page (see parser()) when the server rendered page already has
+    the title, gallery and content detail blocks, None when Chrome is needed (captcha /
+    login wall, JS rendered page, request errors). The page is parsed once, the
+    result is handed to scrape_product.
+    """
+    try:
+        response = await client.get(url)
+    except httpx.HTTPError as error:
+        logger.debug(f"HTTP fast path failed for {url}: {error}")
+        return None
+
+    if response.status_code != 200 or not response.content:
+        return None
+
+    try:
+        parsed_data = parser(response.content)
+    except Exception:
+        return None
+
+    if parsed_data["title_chn"] and parsed_data["gallery_images"] and (
+            parsed_data["text_details_chn"] or parsed_data["img_details"]):
+        logger.info(f"Fetched without browser: {url}")
+        return parsed_data
+    return None
 
-def main(product_urls, gd_main_folder_id, gd_images_folder_id):
 
-    # get masked driver
+def load_cookies():
+    """Unexpired cookies saved by the previous run, [] if there are none"""
+    try:
+        with open(COOKIES_FILE, "r", encoding="utf-8") as f:
+            cookies = json.load(f)
+    except (OSError, ValueError):
+        return []
+
+    now = time.time()
+    return [cookie for cookie in cookies if cookie.get("expiry", now + 1) > now]
+
+
+def save_cookies(driver):
+    try:
+        cookies = driver.get_cookies()
+        with open(COOKIES_FILE, "w", encoding="utf-8") as f:
+            json.dump(cookies, f, ensure_ascii=False)
+        logger.info(f"🍪 Saved {len(cookies)} cookies to {COOKIES_FILE}")
+    except Exception as error:
+        logger.warning(f"Couldn't save cookies: {error}")
+
+
+def _add_cookies(driver, cookies):
+    # cookies can only be set for the domain of the page that's open
+    driver.get(COOKIES_DOMAIN_URL)
+    for cookie in cookies:
+        with contextlib.suppress(Exception):
+            driver.add_cookie(cookie)
+
+
+def _new_driver(cookies=()):
+    """Masked Chrome driver ready for product pages (with the saved session cookies)"""
     driver = get_optimized_driver()
     driver.set_script_timeout(100)
     driver.maximize_window()
+    if cookies:
+        _add_cookies(driver, cookies)
+    return driver
+
 
+class DriverPool:
     """
-    Website detecting the requested host is bot (or not) according to session history(or cookies)
-    if session empty it returns capcha, 
-    to solve this after first request we'll wait a bit, and then request another url
-    without closing the session. So old session will be the history for next requests
-    For that reason we add first url to the end of the list of urls.
+    Pool of warm Chrome drivers shared by the scraping tasks.
+
+    Drivers are started once per run (one by one: undetected_chromedriver
+    patches its binary on start) and borrowed with
+    `async with pool.acquire() as driver:`, so each driver serves one page at
+    a time. A driver whose session died is replaced before it is handed out.
+    Every driver starts with the given cookies, share_session() hands the cookies
+    of a warmed-up driver to the others. The session cookies are saved for the
+    next run on close.
+    Keep the size modest, every Chrome instance takes ~300MB of RAM.
     """
-    product_urls.append(product_urls[0])
 
-    # coming list of tuples like [(url1,), ...]
-    for product_url in product_urls:
+    def __init__(self, size, executor, cookies=()):
+        self.size = size
+        self._executor = executor
+        self._cookies = cookies
+        self._idle = asyncio.Queue()
+        self._drivers = []
+        self._session_driver = None
 
-        product_url = product_url[0]
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        try:
+            for _ in range(self.size):
+                driver = await loop.run_in_executor(self._executor, _new_driver, self._cookies)
+                self._drivers.append(driver)
+                self._idle.put_nowait(driver)
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        driver = await self._idle.get()
+        try:
+            driver = await asyncio.get_running_loop().run_in_executor(self._executor, self._ensure_alive, driver)
+            yield driver
+        finally:
+            self._idle.put_nowait(driver)
+
+    async def share_session(self, driver):
+        """
+        Copy the cookies of a warmed-up driver into the other drivers (and the ones started later),
+        so none of them starts a cold session. Call it before the other drivers are borrowed.
+        """
+        loop = asyncio.get_running_loop()
+        self._cookies = await loop.run_in_executor(self._executor, driver.get_cookies)
+        self._session_driver = driver
+        for other in self._drivers:
+            if other is not driver:
+                await loop.run_in_executor(self._executor, _add_cookies, other, self._cookies)
+
+    def _ensure_alive(self, driver):
+        """Same driver if its session still answers, else a fresh one in its place"""
+        try:
+            if driver.session_id and driver.current_url is not None:
+                return driver
+        except Exception:
+            pass
+
+        logger.warning("Chrome driver session is gone, starting a new one")
+        with contextlib.suppress(Exception):
+            driver.quit()
+        new_driver = _new_driver(self._cookies)
+        self._drivers[self._drivers.index(driver)] = new_driver
+        return new_driver
+
+    def close(self):
+        if self._drivers:
+            # the warmed-up session if there was one (and its driver is still alive)
+            session_driver = self._session_driver if self._session_driver in self._drivers else self._drivers[0]
+            save_cookies(session_driver)
+        for driver in self._drivers:
+            with contextlib.suppress(Exception):
+                driver.quit()
+        self._drivers = []
+
+
+def get_existing_images():
+    """Stored product images as image_url -> first stored row (O(1) lookups instead of list scans)"""
+    existing_images = fetch_many(
+        db=DB_NAME,
+        table=TABLE_PRODUCT_IMAGES,
+        columns_list=["image_url", 
+                    "image_filename",
+                    "image_text",
+                    "image_text_en",
+                    "downloaded_status",
+                    "text_extracted_status",
+                    "text_translated_status",
+                    "product_url",
+                    "gd_img_url"]
+    )
+    existing_by_url = {}
+    for row in existing_images:
+        existing_by_url.setdefault(row[0], row)
+    return existing_by_url
+
+
+def scrape_product(driver, product_url, gd_images_folder_id, existing_by_url, parsed_data=None):
+    """
+    Scrape, parse and store a single product page (blocking, runs in a worker thread).
 
-        json_filename = extract_offer_id(url=product_url)
+    existing_by_url is the shared get_existing_images() cache, new image rows are added to it.
+    parsed_data is the page already fetched and parsed by the HTTP fast path (the driver isn't used then).
+    """
 
-        product_images_folder_name = json_filename
-        gd_product_images_folder_id = get_or_create_sub_subfolder(parent_id=gd_images_folder_id, folder_name=product_images_folder_name)
+    json_filename = extract_offer_id(url=product_url)
 
+    product_images_folder_name = json_filename
+    gd_product_images_folder_id = get_or_create_sub_subfolder(parent_id=gd_images_folder_id, folder_name=product_images_folder_name)
 
-        scraper_result = scrape(driver, product_url)
-        if scraper_result == 404 or scraper_result == None:
-            update_row(
-            db=DB_NAME,
-            table=TABLE_PRODUCT_DATA,
-            column_with_value=[
-                ("scraped_status", "1"),
-                ("translated_status", "1"),
-                ("title_chn", "404"),
-                ("title_en", "Product removed or Invalid URL"),
-                ],
-            where=[("product_url", "=", product_url)],
-            logger=logger
-            )
-            continue
-        elif not scraper_result:
-           continue 
-
-        parsed_data = parser(scraper_result)
-        
-        if not parsed_data:
-            logger.info("Not parsed. Moving to the next product")
-            continue
-
-        time.sleep(1)
-
-        # output_filepath = os.path.join(LOCAL_OUTPUT_FOLDER, f"{json_filename}.json")
-        # with open(output_filepath, "w", encoding="utf-8") as f:
-        #     json.dump(parsed_data, f, ensure_ascii=False, indent=2)
-        
-        title_chn = parsed_data["title_chn"] if parsed_data else None
-        product_attributes_chn = parsed_data["product_attributes_chn"] if parsed_data else None
-        gallery_images = parsed_data["gallery_images"] if parsed_data else None
-        text_details_chn = parsed_data["text_details_chn"] if parsed_data else None
-        img_details = parsed_data["img_details"] if parsed_data else None
-
-        # parsed images
-        product_images = gallery_images + img_details
 
+    if parsed_data is None:
+        status, html = scrape(driver, product_url)
+    else:
+        status, html = 200, None
+    if status == 404 or status == None:
+        update_row(
+        db=DB_NAME,
+        table=TABLE_PRODUCT_DATA,
+        column_with_value=[
+            ("scraped_status", "1"),
+            ("translated_status", "1"),
+            ("title_chn", "404"),
+            ("title_en", "Product removed or Invalid URL"),
+            ],
+        where=[("product_url", "=", product_url)],
+        logger=logger
+        )
+        return
+    elif parsed_data is None:
+        if not html:
+            return
+        parsed_data = parser(html)
+    
+    if not parsed_data:
+        logger.info("Not parsed. Moving to the next product")
+        return
+
+    # output_filepath = os.path.join(LOCAL_OUTPUT_FOLDER, f"{json_filename}.json")
+    # with open(output_filepath, "w", encoding="utf-8") as f:
+    #     json.dump(parsed_data, f, ensure_ascii=False, indent=2)
+    
+    title_chn = parsed_data["title_chn"] if parsed_data else None
+    product_attributes_chn = parsed_data["product_attributes_chn"] if parsed_data else None
+    gallery_images = parsed_data["gallery_images"] if parsed_data else None
+    text_details_chn = parsed_data["text_details_chn"] if parsed_data else None
+    img_details = parsed_data["img_details"] if parsed_data else None
+
+    # parsed images
+    product_images = gallery_images + img_details
+
+    # all writes of the product in one transaction (single commit)
+    with with_transaction(DB_NAME):
         # inserting scraped data to db
         update_row(
             db=DB_NAME,
@@ -183,67 +406,56 @@ def main(product_urls, gd_main_folder_id, gd_images_folder_id):
         )
 
         # inserting product images to db if not exists else add and update with current product id
+        # (rows are collected first and written with one executemany per kind, rows the product
+        # already has are skipped by the unique (product_url, image_url) index)
         if product_images:
-            existing_images = fetch_many(
-                db=DB_NAME,
-                table=TABLE_PRODUCT_IMAGES,
-                columns_list=["image_url", 
-                            "image_filename",
-                            "image_text",
-                            "image_text_en",
-                            "downloaded_status",
-                            "text_extracted_status",
-                            "text_translated_status",
-                            "product_url",
-                            "gd_img_url"]
-            )
-            existing_image_urls = [row[0] for row in existing_images]
-
-            image_details = [(product_url, img_url) for img_url in product_images]
-            
-            for product_url, img_url in image_details:
-                if img_url not in existing_image_urls:
-                    insert_many(
-                        db=DB_NAME,
-                        table=TABLE_PRODUCT_IMAGES,
-                        columns_list=["product_url","image_url", "gd_product_images_folder_id"],
-                        data=[(product_url, img_url, gd_product_images_folder_id)],
-                        logger=logger
-                    )
+            new_rows = []
+            copied_rows = []
+
+            for img_url in product_images:
+                existing_row = existing_by_url.get(img_url)
+                if existing_row is None:
+                    new_rows.append((product_url, img_url, gd_product_images_folder_id))
+                    # keep the cache in line with the new row (column defaults)
+                    existing_by_url.setdefault(img_url, (img_url, None, None, None, 0, 0, 0, product_url, None))
                 else:
-                    lindex = existing_image_urls.index(img_url)
-                    print("EXISTING IMAGE INDEX: ", lindex)
-                    image_url = existing_images[lindex][0]
-                    image_filename = existing_images[lindex][1]
-                    image_text = existing_images[lindex][2]
-                    image_text_en = existing_images[lindex][3]
-                    downloaded_status = existing_images[lindex][4]
-                    text_extracted_status = existing_images[lindex][5]
-                    text_translated_status = existing_images[lindex][6]
-                    gd_img_url = existing_images[lindex][6]
-
-                    row_data = (image_url, image_filename, image_text, image_text_en, 
+                    (image_url, image_filename, image_text, image_text_en,
+                     downloaded_status, text_extracted_status, text_translated_status,
+                     _, gd_img_url) = existing_row
+
+                    copied_rows.append((image_url, image_filename, image_text, image_text_en, 
                             downloaded_status, text_extracted_status, text_translated_status,
-                            gd_img_url, product_url, gd_product_images_folder_id)
-
-                    insert_many(
-                        db=DB_NAME,
-                        table=TABLE_PRODUCT_IMAGES,
-                        columns_list=[
-                            "image_url",
-                            "image_filename",
-                            "image_text",
-                            "image_text_en",
-                            "downloaded_status",
-                            "text_extracted_status",
-                            "text_translated_status",
-                            "gd_img_url",
-                            "product_url",
-                            "gd_product_images_folder_id"
-                        ],
-                        data=[row_data],
-                        logger=logger
-                    )
+                            gd_img_url, product_url, gd_product_images_folder_id))
+
+            if new_rows:
+                insert_many(
+                    db=DB_NAME,
+                    table=TABLE_PRODUCT_IMAGES,
+                    columns_list=["product_url","image_url", "gd_product_images_folder_id"],
+                    data=new_rows,
+                    logger=logger,
+                    or_ignore=True
+                )
+            if copied_rows:
+                insert_many(
+                    db=DB_NAME,
+                    table=TABLE_PRODUCT_IMAGES,
+                    columns_list=[
+                        "image_url",
+                        "image_filename",
+                        "image_text",
+                        "image_text_en",
+                        "downloaded_status",
+                        "text_extracted_status",
+                        "text_translated_status",
+                        "gd_img_url",
+                        "product_url",
+                        "gd_product_images_folder_id"
+                    ],
+                    data=copied_rows,
+                    logger=logger,
+                    or_ignore=True
+                )
         # update scraped status on product_urls table
         update_row(
             db=DB_NAME,
@@ -255,5 +467,83 @@ def main(product_urls, gd_main_folder_id, gd_images_folder_id):
             logger=logger
         )
 
+
+async def main_async(product_urls, gd_main_folder_id, gd_images_folder_id, max_drivers=SCRAPER_DRIVERS,
+                     http_fast=SCRAPER_HTTP_FAST):
+    """
+    Scrape product pages concurrently with a pool of warm Chrome drivers.
+
+    With http_fast each URL is first fetched with a plain HTTP request, Chrome
+    is only used when that page isn't server rendered. Otherwise the URL task
+    borrows an idle driver from the DriverPool (so at most max_drivers pages
+    load at once), runs the blocking Selenium / parsing / DB work in a thread
+    and gives the driver back.
+    """
+
+    """
+    Website detecting the requested host is bot (or not) according to session history(or cookies)
+    if session empty it returns capcha, 
+    to solve this after first request we'll wait a bit, and then request another url
+    without closing the session. So old session will be the history for next requests
+    For that reason the first url is scraped and then visited again on the same driver,
+    its cookies are copied into the other drivers before the rest of the urls are
+    spread over the pool.
+    The session cookies are saved at the end of the run, when the next run
+    starts with them the warm-up request isn't needed.
+    """
+    cookies = load_cookies()
+
+    # coming list of tuples like [(url1,), ...]
+    urls = [product_url[0] for product_url in product_urls]
+    if not urls:
+        return
+
+    # stored images are read once per run, scrape_product keeps the cache up to date
+    existing_by_url = get_existing_images()
+
+    loop = asyncio.get_running_loop()
+    drivers_count = max(1, min(max_drivers, len(urls)))
+
+    with ThreadPoolExecutor(max_workers=drivers_count) as executor:
+        async with DriverPool(drivers_count, executor, cookies) as pool, \
+                httpx.AsyncClient(headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True,
+                                  cookies={cookie["name"]: cookie["value"] for cookie in cookies}) as client:
+
+            async def process_url(product_url):
+                parsed_data = await try_http_fast(client, product_url) if http_fast else None
+                if parsed_data is not None:
+                    await loop.run_in_executor(executor, scrape_product, None, product_url,
+                                               gd_images_folder_id, existing_by_url, parsed_data)
+                    return
+
+                async with pool.acquire() as driver:
+                    await loop.run_in_executor(executor, scrape_product, driver, product_url,
+                                               gd_images_folder_id, existing_by_url)
+
+            if not cookies:
+                # warm-up: first url twice in the same browser session, one after the other,
+                # then every driver of the pool continues that session
+                async with pool.acquire() as driver:
+                    for _ in range(2):
+                        await loop.run_in_executor(executor, scrape_product, driver, urls[0],
+                                                   gd_images_folder_id, existing_by_url)
+                    await pool.share_session(driver)
+                urls = urls[1:]
+
+            results = await asyncio.gather(*[process_url(product_url) for product_url in urls],
+                                           return_exceptions=True)
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors:
+        logger.log_exception(error, context="scraping product page")
+    if errors:
+        # Let the caller's retry / error handling see the failure, as the sequential loop did
+        raise errors[0]
+
     logger.info("📦 All product pages scraped.")
-    driver.quit()
\ No newline at end of file
+
+
+def main(product_urls, gd_main_folder_id, gd_images_folder_id):
+    asyncio.run(main_async(product_urls=product_urls,
+                           gd_main_folder_id=gd_main_folder_id,
+                           gd_images_folder_id=gd_images_folder_id))
@@ -1,5 +1,6 @@
 import json
 from json import JSONDecodeError
+import orjson
 import logging
 from typing import Optional, Dict, Any
 
@@ -20,9 +21,9 @@ def json_loads(json_string: str) -> Optional[Dict[str, Any]]:
         return None
     
     try:
-        # Replace single quotes with double quotes for JSON compatibility
-        json_string = json_string.replace("'", "''")
-        return json.loads(json_string)
+        # parsed as is: values are bound as SQL parameters, no quote escaping is needed
+        # (doubling "'" here corrupted every apostrophe inside the JSON strings)
+        return orjson.loads(json_string)
     except JSONDecodeError as jde:
         logger.error(f"JSON decode error: {str(jde)}")
         return None
@@ -45,13 +46,13 @@ def json_dumps(json_dct: dict) -> Optional[str]:
         return None
     
     try:
-        return json.dumps(json_dct, ensure_ascii=False)
-    except JSONDecodeError as jde:
-        logger.error("JSON decode error while dumping dictionary to string")
-        raise jde
+        # orjson writes UTF-8 as is (like ensure_ascii=False) and is several times faster,
+        # non-string keys (ints from parsed attributes) are converted like json.dumps does
+        return orjson.dumps(json_dct, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
     except TypeError as te:
+        # orjson.JSONEncodeError is a TypeError subclass (unsupported type, bad key, ...)
         logger.error(f"Type error while dumping JSON: {str(te)}")
-        # Try to sanitize the dictionary by converting problematic types
+        # Try to sanitize the dictionary by converting problematic types (str() of custom objects)
         sanitized_dict = _sanitize_json_dict(json_dct)
         return json.dumps(sanitized_dict, ensure_ascii=False)
     except Exception as error: